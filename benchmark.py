@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import database
+from recommender import FEATURES, cached_rank_courses, get_batch_recommendations, get_recommendations
+
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+# Per-row paths are timed on a sample so the 1M run stays practical
+SINGLE_SAMPLE = 10000
+WRITE_SAMPLE = 2000
+DASHBOARD_REPEAT = 200
+CHUNK_SIZE = 5000
+
+STRANDS = [
+    "STEM", "ABM (Accountancy, Business, & Management)",
+    "HUMMS (Humanities & Social Sciences)", "GAS (General Academic Strand)",
+    "TVL (Technical-Vocational-Livelihood)"
+]
+
+def synthetic_assessments(n, seed=0):
+    rng = np.random.default_rng(seed)
+    assessments = pd.DataFrame(rng.integers(1, 6, size=(n, len(FEATURES))), columns=FEATURES)
+    assessments.insert(0, 'name', 'Benchmark')
+    assessments.insert(1, 'school', 'Synthetic High School')
+    assessments.insert(2, 'strand', rng.choice(STRANDS, size=n))
+    assessments.insert(3, 'tvl_strand', 'Not applicable')
+    return assessments
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def throughput(name, size, operations, seconds, **extra):
+    return {
+        'benchmark': name,
+        'size': size,
+        'operations': operations,
+        'seconds': round(seconds, 6),
+        'ops_per_second': round(operations / seconds, 2) if seconds else None,
+        **extra
+    }
+
+def latency(name, size, samples, **extra):
+    samples_ms = np.asarray(samples) * 1000
+    return {
+        'benchmark': name,
+        'size': size,
+        'operations': len(samples),
+        'mean_ms': round(float(samples_ms.mean()), 4),
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples_ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(samples_ms, 99)), 4),
+        **extra
+    }
+
+def bench_scoring(assessments):
+    size = len(assessments)
+    rows = assessments.head(SINGLE_SAMPLE).to_dict('records')
+    # Cold ranks every profile; warm repeats them from the ranking cache.
+    # Earlier sizes score the same leading rows, so the cache is emptied first.
+    cached_rank_courses.cache_clear()
+    seconds, _ = timed(lambda: [get_recommendations(row) for row in rows])
+    yield throughput('score_single', size, len(rows), seconds, cache='cold')
+    seconds, _ = timed(lambda: [get_recommendations(row) for row in rows])
+    yield throughput('score_single', size, len(rows), seconds, cache='warm')
+    
+    seconds, _ = timed(get_batch_recommendations, assessments, explain=False)
+    yield throughput('score_batch', size, size, seconds, explain=False)
+    
+    seconds, _ = timed(get_batch_recommendations, assessments)
+    yield throughput('score_batch', size, size, seconds, explain=True)
+
+def bench_writes(assessments):
+    size = len(assessments)
+    
+    # Interactive path: one transaction per submitted form
+    rows = assessments.head(WRITE_SAMPLE).to_dict('records')
+    recommendations = [get_recommendations(row, with_version=True) for row in rows]
+    seconds, _ = timed(lambda: [
+        database.save_assessment_results(row, recs, version) for row, (recs, version) in zip(rows, recommendations)
+    ])
+    yield throughput('write_single', size, len(rows), seconds)
+    
+    # Bulk path: one transaction per chunk, populates the whole table
+    rows_written = 0
+    seconds = 0.0
+    for start in range(0, size, CHUNK_SIZE):
+        chunk = assessments.iloc[start:start + CHUNK_SIZE]
+        results = get_batch_recommendations(chunk)
+        records = chunk.to_dict('records')
+        elapsed, _ = timed(database.save_batch_results, records, results, results['version'])
+        seconds += elapsed
+        rows_written += len(records)
+    yield throughput('write_batch', size, rows_written, seconds, chunk_size=CHUNK_SIZE)
+
+def bench_dashboard(size):
+    samples = [timed(database.load_dashboard_stats)[0] for _ in range(DASHBOARD_REPEAT)]
+    yield latency('dashboard_query', size, samples)
+    
+    samples = [timed(database.get_dashboard_stats)[0] for _ in range(DASHBOARD_REPEAT)]
+    yield latency('dashboard_cached', size, samples)
+
+def run(sizes, workdir, seed=0):
+    results = []
+    for size in sizes:
+        assessments = synthetic_assessments(size, seed)
+        
+        db_path = os.path.join(workdir, f'benchmark_{size}.db')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        database.set_database_path(db_path)
+        database.init_database()
+        
+        for benchmark in (bench_scoring(assessments), bench_writes(assessments), bench_dashboard(size)):
+            for result in benchmark:
+                print(f"{result['benchmark']:>18} n={size:<8} {json.dumps(result)}", file=sys.stderr)
+                results.append(result)
+        
+        database.get_connection_pool(db_path).close()
+    
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'seed': seed,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sqlite': sqlite3.sqlite_version
+        },
+        'results': results
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scoring, database writes and dashboard queries")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="number of synthetic assessments per run")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help="directory for the benchmark databases (default: a temporary directory)")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        report = run(args.sizes, args.workdir, args.seed)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            report = run(args.sizes, workdir, args.seed)
+    
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import os
+import threading
+import time
+
+import database
+from feedback_writer import get_feedback_writer
+from metrics import start_exporter
+from recommender import get_catalog
+
+
+# Process-wide setup for the app. Streamlit reruns epp.py on every
+# interaction, so everything that only has to happen once per process
+# (schema migrations, loading stored rankings, starting the feedback
+# writer, the metrics file exporter) runs here on the first call. The
+# course catalog is loaded here too and afterwards reloads itself when its
+# data file changes (see recommender.get_catalog).
+_state = None
+_state_lock = threading.Lock()
+
+def bootstrap():
+    global _state
+    with _state_lock:
+        if _state is None:
+            started = time.perf_counter()
+            catalog = get_catalog()
+            database.init_database()
+            profiles = database.load_profile_recommendations()
+            get_feedback_writer()
+            # Prometheus text file, e.g. for node_exporter's textfile collector
+            if os.environ.get('METRICS_PATH'):
+                start_exporter(os.environ['METRICS_PATH'])
+            _state = {
+                'catalog_courses': len(catalog.names),
+                'precomputed_profiles': profiles,
+                'seconds': time.perf_counter() - started
+            }
+        return _state
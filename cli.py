@@ -0,0 +1,189 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+import database
+import rescoring
+import retention
+import training
+from export import EXPORT_FORMATS, export_assessments
+from recommender import CATALOG_PATH, FEATURES, WEIGHTS_PATH, Catalog, get_batch_recommendations, strand_key
+
+
+# Defaults for the optional identity columns of an imported assessment
+IMPORT_DEFAULTS = {
+    'name': 'Anonymous',
+    'school': '',
+    'strand': '',
+    'tvl_strand': 'Not applicable'
+}
+
+# Commands that work on the SQLite file directly
+SQLITE_COMMANDS = {'export', 'precompute', 'rescore', 'archive', 'compact'}
+
+def use_database(path=None):
+    # --db selects a SQLite file. Otherwise the app's storage is used, which
+    # DATABASE_URL may point at a server database; returns the SQLite file,
+    # or None for a server database.
+    if path:
+        database.set_database_path(path)
+        return path
+    storage = database.get_storage()
+    if isinstance(storage, database.SQLiteStorage):
+        # The SQLite-only tools follow a sqlite:/// DATABASE_URL as well
+        database.set_database_path(storage.path)
+        return storage.path
+    return None
+
+def read_chunks(path, chunk_size, file_format=None):
+    import pandas as pd
+    
+    file_format = file_format or os.path.splitext(path)[1].lstrip('.').lower()
+    if file_format == 'csv':
+        return pd.read_csv(path, chunksize=chunk_size)
+    if file_format in ('jsonl', 'ndjson', 'json'):
+        return pd.read_json(path, lines=True, chunksize=chunk_size)
+    raise ValueError(f"unsupported input format: {file_format!r} (expected csv or jsonl)")
+
+def prepare_chunk(chunk, first_row):
+    missing = [feature for feature in FEATURES if feature not in chunk.columns]
+    if missing:
+        raise ValueError(f"missing assessment columns: {', '.join(missing)}")
+    
+    answers = chunk[FEATURES].to_numpy(dtype=np.float64)
+    invalid = np.isnan(answers).any(axis=1) | ((answers < 1) | (answers > 5) | (answers % 1 != 0)).any(axis=1)
+    if invalid.any():
+        row = first_row + int(np.flatnonzero(invalid)[0])
+        raise ValueError(f"row {row}: answers must be whole numbers from 1 to 5")
+    
+    chunk = chunk.copy()
+    for column, default in IMPORT_DEFAULTS.items():
+        if column not in chunk.columns:
+            chunk[column] = default
+        else:
+            chunk[column] = chunk[column].fillna(default).astype(str)
+    chunk[FEATURES] = answers.astype(int)
+    return chunk[list(IMPORT_DEFAULTS) + FEATURES].to_dict('records')
+
+def import_assessments(path, chunk_size=5000, k=3, file_format=None):
+    database.init_database()
+    
+    imported = 0
+    for chunk in read_chunks(path, chunk_size, file_format):
+        rows = prepare_chunk(chunk, imported + 1)
+        strands = [strand_key(row['strand'], row['tvl_strand']) for row in rows]
+        results = get_batch_recommendations(chunk[FEATURES], k=k, strands=strands)
+        database.save_batch_results(rows, results, results['version'])
+        imported += len(rows)
+        print(f"imported {imported} assessments", file=sys.stderr)
+    
+    return imported
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Course Recommendation System command line tools")
+    parser.add_argument(
+        '--db', help=f"SQLite database file (default: DATABASE_URL when set, otherwise {database.DATABASE_PATH})"
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    import_parser = commands.add_parser('import', help="score and store a CSV/JSONL file of assessments")
+    import_parser.add_argument('path')
+    import_parser.add_argument('--format', choices=['csv', 'jsonl'], help="input format (default: from file extension)")
+    import_parser.add_argument('--chunk-size', type=int, default=5000)
+    import_parser.add_argument('--top-k', type=int, default=3)
+    
+    export_parser = commands.add_parser('export', help="write assessments joined with recommendations and feedback")
+    export_parser.add_argument('path')
+    export_parser.add_argument('--format', choices=EXPORT_FORMATS, help="output format (default: from file extension)")
+    export_parser.add_argument('--chunk-size', type=int, default=10000)
+    
+    precompute_parser = commands.add_parser('precompute', help="store rankings for the most common answer profiles")
+    precompute_parser.add_argument('--limit', type=int, default=1000, help="number of profiles to store")
+    precompute_parser.add_argument('--top-k', type=int, default=3)
+    
+    train_parser = commands.add_parser('train', help="fit course weights from feedback ratings")
+    train_parser.add_argument('--output', help="weight artifact path (default: the path the app loads)")
+    train_parser.add_argument('--ridge', type=float, default=training.DEFAULT_RIDGE,
+                              help="pull toward the hand-set weights; higher needs more ratings to move")
+    
+    rescore_parser = commands.add_parser('rescore', help="regenerate stored recommendations with the current scoring")
+    rescore_parser.add_argument('--workers', type=int, help="scoring processes (default: one per CPU)")
+    rescore_parser.add_argument('--chunk-size', type=int, default=rescoring.CHUNK_SIZE,
+                                help="assessment ids per chunk; a resumed job keeps its original size")
+    rescore_parser.add_argument('--top-k', type=int, default=3)
+    
+    archive_parser = commands.add_parser('archive', help="move old assessments into compressed archive files")
+    archive_parser.add_argument('--older-than-days', type=int, default=retention.RETENTION_DAYS)
+    archive_parser.add_argument('--directory', default=retention.ARCHIVE_DIRECTORY)
+    archive_parser.add_argument('--chunk-size', type=int, default=retention.ARCHIVE_CHUNK_SIZE,
+                                help="assessments per archive file and write transaction")
+    
+    compact_parser = commands.add_parser('compact', help="return free space to the file system with incremental vacuum")
+    compact_parser.add_argument('--full', action='store_true',
+                                help="one-time VACUUM for a database made before incremental vacuum; blocks writers")
+    
+    catalog_parser = commands.add_parser('catalog', help="check a course catalog file and count the courses per strand")
+    catalog_parser.add_argument('path', nargs='?', default=CATALOG_PATH,
+                                help="catalog file (default: the one the app loads)")
+    
+    args = parser.parse_args(argv)
+    
+    try:
+        if args.command != 'catalog':
+            db_path = use_database(args.db)
+            if db_path is None and args.command in SQLITE_COMMANDS:
+                raise ValueError(f"{args.command} needs a SQLite database; DATABASE_URL is a server database, use --db")
+        
+        if args.command == 'import':
+            count = import_assessments(args.path, args.chunk_size, args.top_k, args.format)
+            print(f"Imported {count} assessments into {db_path or 'the DATABASE_URL database'}")
+        elif args.command == 'export':
+            # A mistyped path would otherwise export from a new empty file
+            if not os.path.exists(db_path):
+                raise ValueError(f"no database at {db_path}")
+            database.init_database()
+            count = export_assessments(args.path, args.format, args.chunk_size)
+            print(f"Exported {count} rows to {args.path}")
+        elif args.command == 'precompute':
+            database.init_database()
+            count = database.precompute_profile_recommendations(args.limit, args.top_k)
+            print(f"Stored rankings for {count} answer profiles")
+        elif args.command == 'train':
+            database.init_database()
+            artifact = training.train(args.ridge)
+            path = training.write_artifact(artifact, args.output or training.WEIGHTS_PATH)
+            print(
+                f"Trained on {artifact['ratings']} ratings: RMSE {artifact['rmse']['rules']:.3f} (rules) "
+                f"-> {artifact['rmse']['learned']:.3f} (learned); wrote {path}"
+            )
+        elif args.command == 'rescore':
+            result = rescoring.rescore(args.workers, args.chunk_size, args.top_k)
+            print(
+                f"Re-scored {result['rescored']} assessments with version {result['version']} "
+                f"({result['resumed']} of {result['chunks']} chunks were already done)"
+            )
+        elif args.command == 'archive':
+            result = retention.archive(args.older_than_days, args.directory, args.chunk_size)
+            print(
+                f"Archived {result['archived']} assessments from before {result['cutoff']} "
+                f"into {result['files']} files in {result['directory']}; "
+                f"moved {result['explanations_moved']} explanations into the explanations table"
+            )
+        elif args.command == 'compact':
+            result = retention.compact(args.full)
+            print(
+                f"Freed {result['freed_pages']} pages: {result['bytes_before']} -> {result['bytes_after']} bytes "
+                f"in {result['seconds']}s"
+            )
+        elif args.command == 'catalog':
+            catalog = Catalog.from_files(args.path, WEIGHTS_PATH)
+            print(f"{len(catalog.names)} courses, scoring version {catalog.version}")
+            for strand in catalog.strands:
+                print(f"  {strand}: {len(catalog.scope(catalog.scope_key(strand))[0])} courses")
+    except ValueError as error:
+        parser.exit(1, f"error: {error}\n")
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,28 @@
+import os
+import time
+
 import streamlit as st
-import sqlite3
-import pandas as pd
-import numpy as np
 from datetime import datetime
 
+from recommender import get_recommendations, recommendation_cache_info
+from bootstrap import bootstrap
+from database import (
+    TREND_PERIODS, save_assessment_results, get_dashboard_stats, get_stats_cache, load_trend_slices, load_trends
+)
+from feedback_writer import get_feedback_writer
+from metrics import get_registry, metrics_page_allowed
+from neighbors import get_neighbor_index, get_neighbor_recommendations, neighbor_scoring_version
+from views import render_dashboard_stats, render_popular_courses, render_recommendation
+
+# 'rules' scores answers only; 'neighbors' also blends in ratings from
+# students with similar answers
+RECOMMENDER_MODE = os.environ.get('RECOMMENDER_MODE', 'rules')
+# The admin metrics page (which can also reset the metrics) is off unless
+# METRICS_TOKEN is set; open it with ?page=metrics&token=<METRICS_TOKEN>
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+
+render_started = time.perf_counter()
 
 # Page configuration
 st.set_page_config(
@@ -24,307 +43,13 @@ hide_streamlit_style = """
 st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
 
-# Initialize database
-def init_database():
-    conn = sqlite3.connect('course_recommendation.db')
-    cursor = conn.cursor()
-    
-    # Create tables
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS assessments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            school TEXT,
-            strand TEXT,
-            tvl_strand TEXT,
-            science_interest INTEGER,
-            arts_interest INTEGER,
-            teaching_interest INTEGER,
-            business_interest INTEGER,
-            technology_interest INTEGER,
-            design_interest INTEGER,
-            sports_interest INTEGER,
-            logical_ability INTEGER,
-            creativity_ability INTEGER,
-            communication_ability INTEGER,
-            practical_ability INTEGER,
-            teamwork_ability INTEGER,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS recommendations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            assessment_id INTEGER,
-            course_name TEXT,
-            confidence_score REAL,
-            explanation TEXT,
-            FOREIGN KEY (assessment_id) REFERENCES assessments (id)
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS feedback (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            assessment_id INTEGER,
-            course_name TEXT,
-            rating INTEGER,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (assessment_id) REFERENCES assessments (id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-# Course data with descriptions
-COURSES = {
-    "Computer Science": {
-        "description": "Study algorithms, programming, software development, and computational theory. Prepare for careers in software engineering, AI development, and tech innovation.",
-        "image": "💻"
-    },
-    "Information Technology": {
-        "description": "Focus on practical application of technology in business environments. Learn system administration, network management, and IT support.",
-        "image": "🖥️"
-    },
-    "Data Science": {
-        "description": "Combine statistics, programming, and domain expertise to extract insights from data. Work with big data, machine learning, and analytics.",
-        "image": "📊"
-    },
-    "Engineering": {
-        "description": "Apply mathematical and scientific principles to design and build solutions. Specializations include civil, electrical, mechanical, and more.",
-        "image": "⚙️"
-    },
-    "Business Administration": {
-        "description": "Learn management principles, finance, marketing, and operations. Prepare for leadership roles in various industries.",
-        "image": "💼"
-    },
-    "Psychology": {
-        "description": "Study human behavior, mental processes, and emotional well-being. Pursue careers in counseling, research, or organizational psychology.",
-        "image": "🧠"
-    },
-    "Education": {
-        "description": "Prepare to become an educator and shape future generations. Learn teaching methodologies, curriculum development, and educational psychology.",
-        "image": "📚"
-    },
-    "Nursing": {
-        "description": "Provide healthcare services and patient care. Learn medical procedures, patient assessment, and healthcare management.",
-        "image": "🏥"
-    },
-    "Multimedia Arts": {
-        "description": "Combine creativity with technology to create digital content. Learn graphic design, animation, video production, and digital marketing.",
-        "image": "🎨"
-    },
-    "Hospitality Management": {
-        "description": "Manage hotels, restaurants, and tourism businesses. Learn customer service, operations management, and hospitality industry practices.",
-        "image": "🏨"
-    }
-}
-
-# Simple recommendation algorithm
-def get_recommendations(user_data):
-    # Simple rule-based recommendation system
-    recommendations = []
-    
-    # Extract user preferences
-    interests = {
-        'science': user_data['science_interest'],
-        'arts': user_data['arts_interest'],
-        'teaching': user_data['teaching_interest'],
-        'business': user_data['business_interest'],
-        'technology': user_data['technology_interest'],
-        'design': user_data['design_interest'],
-        'sports': user_data['sports_interest']
-    }
-    
-    abilities = {
-        'logical': user_data['logical_ability'],
-        'creativity': user_data['creativity_ability'],
-        'communication': user_data['communication_ability'],
-        'practical': user_data['practical_ability'],
-        'teamwork': user_data['teamwork_ability']
-    }
-    
-    # Course matching logic
-    course_scores = {}
-    
-    # Computer Science
-    score = (interests['technology'] * 0.4 + interests['science'] * 0.3 + 
-             abilities['logical'] * 0.3)
-    course_scores['Computer Science'] = score
-    
-    # Information Technology
-    score = (interests['technology'] * 0.5 + abilities['practical'] * 0.3 + 
-             abilities['logical'] * 0.2)
-    course_scores['Information Technology'] = score
-    
-    # Data Science
-    score = (interests['science'] * 0.4 + interests['technology'] * 0.3 + 
-             abilities['logical'] * 0.3)
-    course_scores['Data Science'] = score
-    
-    # Engineering
-    score = (interests['science'] * 0.4 + abilities['logical'] * 0.3 + 
-             abilities['practical'] * 0.3)
-    course_scores['Engineering'] = score
-    
-    # Business Administration
-    score = (interests['business'] * 0.4 + abilities['communication'] * 0.3 + 
-             abilities['teamwork'] * 0.3)
-    course_scores['Business Administration'] = score
-    
-    # Psychology
-    score = (interests['teaching'] * 0.3 + abilities['communication'] * 0.4 + 
-             abilities['teamwork'] * 0.3)
-    course_scores['Psychology'] = score
-    
-    # Education
-    score = (interests['teaching'] * 0.5 + abilities['communication'] * 0.3 + 
-             abilities['teamwork'] * 0.2)
-    course_scores['Education'] = score
-    
-    # Nursing
-    score = (interests['science'] * 0.3 + abilities['communication'] * 0.3 + 
-             abilities['teamwork'] * 0.4)
-    course_scores['Nursing'] = score
-    
-    # Multimedia Arts
-    score = (interests['arts'] * 0.4 + interests['design'] * 0.4 + 
-             abilities['creativity'] * 0.2)
-    course_scores['Multimedia Arts'] = score
-    
-    # Hospitality Management
-    score = (interests['business'] * 0.3 + abilities['communication'] * 0.4 + 
-             abilities['teamwork'] * 0.3)
-    course_scores['Hospitality Management'] = score
-    
-    # Sort courses by score and get top 3
-    sorted_courses = sorted(course_scores.items(), key=lambda x: x[1], reverse=True)
-    top_3 = sorted_courses[:3]
-    
-    # Generate explanations
-    for course, score in top_3:
-        explanation = generate_explanation(course, interests, abilities)
-        recommendations.append({
-            'course': course,
-            'score': score,
-            'explanation': explanation
-        })
-    
-    return recommendations
-
-def generate_explanation(course, interests, abilities):
-    explanations = {
-        'Computer Science': f"Recommended because of your interest in technology ({interests['technology']}/5) and strong logical thinking abilities ({abilities['logical']}/5).",
-        'Information Technology': f"Great fit due to your technology interest ({interests['technology']}/5) and practical skills ({abilities['practical']}/5).",
-        'Data Science': f"Perfect match with your science interest ({interests['science']}/5) and logical abilities ({abilities['logical']}/5).",
-        'Engineering': f"Suits your science interest ({interests['science']}/5) and practical problem-solving skills ({abilities['practical']}/5).",
-        'Business Administration': f"Aligns with your business interest ({interests['business']}/5) and communication skills ({abilities['communication']}/5).",
-        'Psychology': f"Matches your interest in helping others and strong communication abilities ({abilities['communication']}/5).",
-        'Education': f"Perfect for your teaching interest ({interests['teaching']}/5) and communication skills ({abilities['communication']}/5).",
-        'Nursing': f"Great choice given your interest in helping others and teamwork abilities ({abilities['teamwork']}/5).",
-        'Multimedia Arts': f"Excellent match for your artistic interests ({interests['arts']}/5) and creativity ({abilities['creativity']}/5).",
-        'Hospitality Management': f"Suits your business interest ({interests['business']}/5) and people skills ({abilities['communication']}/5)."
-    }
-    return explanations.get(course, "This course matches your profile based on your interests and abilities.")
-
-# Database functions
-def save_assessment(data):
-    conn = sqlite3.connect('course_recommendation.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO assessments (
-            name, school, strand, tvl_strand, science_interest, arts_interest,
-            teaching_interest, business_interest, technology_interest, design_interest,
-            sports_interest, logical_ability, creativity_ability, communication_ability,
-            practical_ability, teamwork_ability
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        data['name'], data['school'], data['strand'], data['tvl_strand'],
-        data['science_interest'], data['arts_interest'], data['teaching_interest'],
-        data['business_interest'], data['technology_interest'], data['design_interest'],
-        data['sports_interest'], data['logical_ability'], data['creativity_ability'],
-        data['communication_ability'], data['practical_ability'], data['teamwork_ability']
-    ))
-    
-    assessment_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return assessment_id
-
-def save_recommendations(assessment_id, recommendations):
-    conn = sqlite3.connect('course_recommendation.db')
-    cursor = conn.cursor()
-    
-    for rec in recommendations:
-        cursor.execute('''
-            INSERT INTO recommendations (assessment_id, course_name, confidence_score, explanation)
-            VALUES (?, ?, ?, ?)
-        ''', (assessment_id, rec['course'], rec['score'], rec['explanation']))
-    
-    conn.commit()
-    conn.close()
-
-def save_feedback(assessment_id, course_name, rating):
-    conn = sqlite3.connect('course_recommendation.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO feedback (assessment_id, course_name, rating)
-        VALUES (?, ?, ?)
-    ''', (assessment_id, course_name, rating))
-    
-    conn.commit()
-    conn.close()
-
-def get_dashboard_stats():
-    conn = sqlite3.connect('course_recommendation.db')
-    
-    # Total courses available
-    total_courses = len(COURSES)
-    
-    # Total assessments
-    try:
-        assessments_df = pd.read_sql_query("SELECT COUNT(*) as count FROM assessments", conn)
-        total_assessments = assessments_df['count'].iloc[0]
-    except:
-        total_assessments = 0
-    
-    # Agreement rate (average rating)
-    try:
-        feedback_df = pd.read_sql_query("SELECT AVG(rating) as avg_rating FROM feedback", conn)
-        avg_rating = feedback_df['avg_rating'].iloc[0]
-        agreement_rate = (avg_rating / 5.0 * 100) if avg_rating else 0
-    except:
-        agreement_rate = 0
-    
-    # Most recommended courses
-    try:
-        popular_courses_df = pd.read_sql_query('''
-            SELECT course_name, COUNT(*) as count 
-            FROM recommendations 
-            GROUP BY course_name 
-            ORDER BY count DESC 
-            LIMIT 3
-        ''', conn)
-        popular_courses = popular_courses_df.to_dict('records')
-    except:
-        popular_courses = []
-    
-    conn.close()
-    
-    return {
-        'total_courses': total_courses,
-        'total_assessments': total_assessments,
-        'agreement_rate': agreement_rate,
-        'popular_courses': popular_courses
-    }
-
 # Initialize session state
 if 'page' not in st.session_state:
-    st.session_state.page = 'Dashboard'
+    # The metrics page is not in the sidebar and needs the token
+    if metrics_page_allowed(st.experimental_get_query_params(), METRICS_TOKEN):
+        st.session_state.page = 'Metrics'
+    else:
+        st.session_state.page = 'Dashboard'
 if 'assessment_data' not in st.session_state:
     st.session_state.assessment_data = None
 if 'recommendations' not in st.session_state:
@@ -332,8 +57,8 @@ if 'recommendations' not in st.session_state:
 if 'assessment_id' not in st.session_state:
     st.session_state.assessment_id = None
 
-# Initialize database
-init_database()
+# Set up the database, stored rankings and feedback writer once per process
+bootstrap()
 
 # Sidebar
 st.sidebar.title("🎓 Course Recommendation System")
@@ -345,11 +70,17 @@ if st.sidebar.button("📊 Dashboard", use_container_width=True):
 if st.sidebar.button("📝 Assessment", use_container_width=True):
     st.session_state.page = 'Assessment'
 
+if st.sidebar.button("📈 Trends", use_container_width=True):
+    st.session_state.page = 'Trends'
+
 # Add some spacing
 st.sidebar.markdown("---")
 st.sidebar.markdown("**About this System**")
 st.sidebar.info("This AI-powered system helps Senior High School students choose suitable college courses based on their interests and abilities.")
 
+# Page rendered on this run, for the render timings
+page = st.session_state.page
+
 # Dashboard Page
 if st.session_state.page == "Dashboard":
     st.title("📊 Dashboard")
@@ -359,52 +90,52 @@ if st.session_state.page == "Dashboard":
     stats = get_dashboard_stats()
     
     # Upper part - Statistics
+    render_dashboard_stats(stats)
+    
+    st.divider()
+    
+    # Lower part - Most recommended courses
+    st.subheader("🏆 Most Recommended Courses")
+    render_popular_courses(stats['popular_courses'])
+
+# Trends Page
+elif st.session_state.page == "Trends":
+    import pandas as pd
+    
+    st.title("📈 Trends")
+    st.markdown("Assessments, recommendations and agreement over time")
+    
+    # Filters; blank strands and schools are stored as ''
+    slices = load_trend_slices()
+    strands = {"All strands": None, **{strand or "(not given)": strand for strand in slices['strands']}}
+    schools = {"All schools": None, **{school or "(not given)": school for school in slices['schools']}}
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        st.metric(
-            label="📚 Total Courses Available",
-            value=stats['total_courses']
-        )
+        period = st.radio("Group by", [period.capitalize() for period in TREND_PERIODS], index=1, horizontal=True)
     
     with col2:
-        st.metric(
-            label="✅ Assessments Completed",
-            value=stats['total_assessments']
-        )
+        strand = st.selectbox("Strand", list(strands))
     
     with col3:
-        st.metric(
-            label="👍 Agreement Rate",
-            value=f"{stats['agreement_rate']:.1f}%"
-        )
+        school = st.selectbox("School", list(schools))
     
-    st.divider()
-    
-    # Lower part - Most recommended courses
-    st.subheader("🏆 Most Recommended Courses")
+    period = period.lower()
+    trends = load_trends(period, strands[strand], schools[school])
     
-    if stats['popular_courses']:
-        for i, course_data in enumerate(stats['popular_courses']):
-            course_name = course_data['course_name']
-            count = course_data['count']
-            
-            if course_name in COURSES:
-                col1, col2 = st.columns([1, 4])
-                
-                with col1:
-                    st.markdown(f"<div style='font-size: 60px; text-align: center;'>{COURSES[course_name]['image']}</div>", 
-                              unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown(f"### {course_name}")
-                    st.write(COURSES[course_name]['description'])
-                    st.caption(f"Recommended {count} times")
-                
-                if i < len(stats['popular_courses']) - 1:
-                    st.divider()
+    if trends['periods']:
+        index = pd.to_datetime(pd.Index(trends['periods'], name=period.capitalize()))
+        
+        st.subheader("✅ Assessments Completed")
+        st.bar_chart(pd.DataFrame({'Assessments': trends['assessments']}, index=index))
+        
+        st.subheader("👍 Agreement Rate (%)")
+        st.line_chart(pd.DataFrame({'Agreement rate': trends['agreement_rate']}, index=index, dtype=float))
+        
+        st.subheader("🏆 Share of Recommendations (%)")
+        st.area_chart(pd.DataFrame(trends['recommendation_share'], index=index))
     else:
-        st.info("No recommendations yet. Complete an assessment to see popular courses!")
+        st.info("No assessments for this selection yet.")
 
 # Assessment Page
 elif st.session_state.page == "Assessment":
@@ -558,14 +289,17 @@ elif st.session_state.page == "Assessment":
                 'teamwork_ability': teamwork_ability
             }
             
-            # Save to database and get ID
-            assessment_id = save_assessment(assessment_data)
-            
             # Get recommendations
-            recommendations = get_recommendations(assessment_data)
+            if RECOMMENDER_MODE == 'neighbors':
+                # Tagged with the index's own version, not the rules' scoring version
+                index = get_neighbor_index()
+                recommendations = get_neighbor_recommendations(assessment_data, index=index)
+                version = neighbor_scoring_version(index)
+            else:
+                recommendations, version = get_recommendations(assessment_data, with_version=True)
             
-            # Save recommendations to database
-            save_recommendations(assessment_id, recommendations)
+            # Save assessment and recommendations together and get ID
+            assessment_id = save_assessment_results(assessment_data, recommendations, version)
             
             # Store in session state
             st.session_state.assessment_data = assessment_data
@@ -587,59 +321,9 @@ elif st.session_state.page == "Results":
         st.write(f"Based on your assessment, here are the top 3 courses recommended for you:")
         
         for i, rec in enumerate(st.session_state.recommendations):
-            course_name = rec['course']
-            score = rec['score']
-            explanation = rec['explanation']
-            
-            # Create a container for each recommendation
-            with st.container():
-                col1, col2 = st.columns([1, 4])
-                
-                with col1:
-                    st.markdown(f"<div style='font-size: 80px; text-align: center;'>{COURSES[course_name]['image']}</div>", 
-                              unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown(f"### {course_name}")
-                    st.write(COURSES[course_name]['description'])
-                    st.info(f"**Why this course?** {explanation}")
-                    
-                    # Confidence score
-                    confidence_percent = min(95, max(60, score * 20))  # Scale to percentage
-                    st.progress(confidence_percent / 100)
-                    st.caption(f"Match confidence: {confidence_percent:.0f}%")
-                
-                # Feedback section
-                st.write("**Did you like this recommendation?**")
-                
-                # Create unique key for each course rating
-                rating_key = f"rating_{course_name}_{st.session_state.assessment_id}"
-                
-                col1, col2, col3, col4, col5 = st.columns(5)
-                rating = None
-                
-                with col1:
-                    if st.button("😞 1", key=f"{rating_key}_1"):
-                        rating = 1
-                with col2:
-                    if st.button("🙁 2", key=f"{rating_key}_2"):
-                        rating = 2
-                with col3:
-                    if st.button("😐 3", key=f"{rating_key}_3"):
-                        rating = 3
-                with col4:
-                    if st.button("🙂 4", key=f"{rating_key}_4"):
-                        rating = 4
-                with col5:
-                    if st.button("😊 5", key=f"{rating_key}_5"):
-                        rating = 5
-                
-                if rating:
-                    save_feedback(st.session_state.assessment_id, course_name, rating)
-                    st.success(f"Thank you for rating {course_name}!")
-                
-                if i < len(st.session_state.recommendations) - 1:
-                    st.divider()
+            render_recommendation(rec, st.session_state.assessment_id)
+            if i < len(st.session_state.recommendations) - 1:
+                st.divider()
         
         st.divider()
         
@@ -658,6 +342,62 @@ elif st.session_state.page == "Results":
             st.session_state.page = 'Assessment'
             st.rerun()
 
+# Metrics Page
+elif st.session_state.page == "Metrics":
+    st.title("📈 Metrics")
+    st.caption("Latencies and counters recorded by this server process since it started")
+    
+    registry = get_registry()
+    snapshot = registry.snapshot()
+    
+    st.subheader("Latency (ms)")
+    if snapshot['histograms']:
+        st.dataframe([
+            {
+                'metric': histogram['name'],
+                **histogram['labels'],
+                'count': histogram['count'],
+                'mean': histogram['mean'] * 1000,
+                'p50': histogram['p50'] * 1000,
+                'p95': histogram['p95'] * 1000,
+                'p99': histogram['p99'] * 1000
+            }
+            for histogram in snapshot['histograms']
+        ], use_container_width=True)
+    else:
+        st.info("Nothing timed yet.")
+    
+    st.subheader("Counters")
+    if snapshot['counters']:
+        st.dataframe([
+            {'metric': counter['name'], **counter['labels'], 'value': counter['value']}
+            for counter in snapshot['counters']
+        ], use_container_width=True)
+    else:
+        st.info("No errors recorded.")
+    
+    st.subheader("Caches")
+    writer = get_feedback_writer()
+    st.json({
+        'dashboard_stats': get_stats_cache().info(),
+        'recommendations': recommendation_cache_info(),
+        'feedback_writer': {'pending': writer.pending(), 'written': writer.written, 'failures': writer.failures}
+    })
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "⬇️ Prometheus metrics", registry.prometheus_text(),
+            file_name="metrics.prom", mime="text/plain", use_container_width=True
+        )
+    with col2:
+        if st.button("🔄 Reset metrics", use_container_width=True):
+            registry.reset()
+            st.rerun()
+
 # Footer
 st.markdown("---")
 st.markdown("**Course Recommendation System** - Helping Senior High School students choose their ideal college course")
+
+# Whole run, widget rendering included
+get_registry().observe('page_render_seconds', time.perf_counter() - render_started, page=page)
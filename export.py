@@ -0,0 +1,89 @@
+import os
+
+from database import get_connection
+from recommender import FEATURES
+
+
+# One row per (assessment, recommendation, feedback) combination. The
+# ORDER BY follows the primary key and the recommendation/feedback
+# indexes, so SQLite streams rows without a sort step.
+EXPORT_QUERY = f'''
+    SELECT
+        a.id AS assessment_id, a.name, a.school, a.strand, a.tvl_strand,
+        {', '.join(f'a.{feature}' for feature in FEATURES)},
+        a.timestamp AS assessment_timestamp,
+        r.course_name, r.confidence_score, COALESCE(r.explanation, e.text) AS explanation, r.recommendation_version,
+        f.rating, f.timestamp AS feedback_timestamp
+    FROM assessments a
+    LEFT JOIN recommendations r ON r.assessment_id = a.id
+    LEFT JOIN explanations e ON e.id = r.explanation_id
+    LEFT JOIN feedback f ON f.assessment_id = a.id AND f.course_name = r.course_name
+    ORDER BY a.id, r.id, f.id
+'''
+
+# Fixed column types so every chunk has the same schema, even when a
+# chunk happens to have no recommendations or ratings at all
+EXPORT_DTYPES = {
+    'assessment_id': 'Int64',
+    'name': 'string',
+    'school': 'string',
+    'strand': 'string',
+    'tvl_strand': 'string',
+    **{feature: 'Int64' for feature in FEATURES},
+    'assessment_timestamp': 'string',
+    'course_name': 'string',
+    'confidence_score': 'float64',
+    'explanation': 'string',
+    'recommendation_version': 'string',
+    'rating': 'Int64',
+    'feedback_timestamp': 'string'
+}
+
+EXPORT_FORMATS = ['csv', 'parquet']
+
+def iter_export_chunks(chunk_size=10000):
+    import pandas as pd
+    
+    with get_connection() as conn:
+        for chunk in pd.read_sql_query(EXPORT_QUERY, conn, chunksize=chunk_size):
+            yield chunk.astype(EXPORT_DTYPES)
+
+def write_csv(chunks, path):
+    rows = 0
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        for index, chunk in enumerate(chunks):
+            chunk.to_csv(output, header=index == 0, index=False)
+            rows += len(chunk)
+    return rows
+
+def write_parquet(chunks, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow)")
+    
+    # Each chunk becomes one row group
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def export_assessments(path, file_format=None, chunk_size=10000):
+    file_format = file_format or os.path.splitext(path)[1].lstrip('.').lower()
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"unsupported export format: {file_format!r} (expected csv or parquet)")
+    
+    chunks = iter_export_chunks(chunk_size)
+    if file_format == 'parquet':
+        return write_parquet(chunks, path)
+    return write_csv(chunks, path)
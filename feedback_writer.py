@@ -0,0 +1,98 @@
+import atexit
+import logging
+import threading
+
+import database
+
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 1.0
+FLUSH_SIZE = 100
+
+class FeedbackWriter:
+    # Write-behind queue for feedback ratings. Ratings are collected per
+    # (assessment_id, course_name), so repeated clicks collapse into the
+    # latest one, and a background thread writes them in batches.
+    def __init__(self, flush_interval=FLUSH_INTERVAL, flush_size=FLUSH_SIZE, write=None):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.write = write or database.save_feedback_batch
+        self.written = 0
+        self.failures = 0
+        self._pending = {}
+        self._closed = False
+        self._condition = threading.Condition()
+        # Held while a batch is taken and written so batches land in order
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='feedback-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def submit(self, assessment_id, course_name, rating):
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("feedback writer is closed")
+            key = (assessment_id, course_name)
+            self._pending.pop(key, None)
+            self._pending[key] = rating
+            if len(self._pending) >= self.flush_size:
+                self._condition.notify()
+    
+    def pending(self):
+        with self._condition:
+            return len(self._pending)
+    
+    def flush(self):
+        with self._write_lock:
+            with self._condition:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            try:
+                self.write([(assessment_id, course, rating) for (assessment_id, course), rating in batch.items()])
+            except Exception:
+                # Put the batch back, behind anything clicked since
+                with self._condition:
+                    batch.update(self._pending)
+                    self._pending = batch
+                self.failures += 1
+                raise
+            self.written += len(batch)
+            return len(batch)
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._closed or len(self._pending) >= self.flush_size,
+                    timeout=self.flush_interval
+                )
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("failed to write feedback batch; will retry")
+            if closed:
+                return
+    
+    def close(self):
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        # Anything left after a failed final write gets one more try here
+        self.flush()
+        atexit.unregister(self.close)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_feedback_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = FeedbackWriter()
+        return _writer
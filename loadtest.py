@@ -0,0 +1,253 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+
+import database
+from benchmark import STRANDS, latency, synthetic_assessments
+from feedback_writer import get_feedback_writer
+from recommender import FEATURES, get_batch_recommendations, get_recommendations
+
+
+# Simulated students hitting the app's write paths at the same time. Each
+# session submits the assessment form, rates some of the recommended
+# courses and opens the dashboard, like a student clicking through the app.
+OPERATIONS = ['submit', 'feedback', 'dashboard']
+RATING_PROBABILITY = 0.5
+PREFILL_CHUNK_SIZE = 5000
+
+def is_lock_error(error):
+    return isinstance(error, sqlite3.OperationalError) and (
+        'locked' in str(error) or 'busy' in str(error)
+    )
+
+def student(rng):
+    data = {
+        'name': 'Load Test',
+        'school': 'Synthetic High School',
+        'strand': STRANDS[rng.integers(len(STRANDS))],
+        'tvl_strand': 'Not applicable'
+    }
+    data.update(zip(FEATURES, rng.integers(1, 6, size=len(FEATURES)).tolist()))
+    return data
+
+def submit(data, write_path):
+    # 'results' is what the Assessment form does today; 'split' is the
+    # older three-step path with separate transactions
+    if write_path == 'split':
+        assessment_id = database.save_assessment(data)
+        recommendations, version = get_recommendations(data, with_version=True)
+        database.save_recommendations(assessment_id, recommendations, version)
+    else:
+        recommendations, version = get_recommendations(data, with_version=True)
+        assessment_id = database.save_assessment_results(data, recommendations, version)
+    return assessment_id, recommendations
+
+def drain_feedback_writer(close=False):
+    # Batches written by the writer's own thread fail outside attempt(), so
+    # they are counted from the writer: failed writes and ratings it still
+    # holds after the final write
+    writer = get_feedback_writer()
+    try:
+        if close:
+            writer.close()
+        else:
+            writer.flush()
+    except Exception:
+        # Already counted in writer.failures
+        pass
+    return {'written': writer.written, 'failures': writer.failures, 'pending': writer.pending()}
+
+def run_sessions(worker, config, db_path=None):
+    # One worker's loop. Returns raw latencies per operation and error counts
+    # so the caller can merge workers before computing percentiles.
+    if db_path:
+        database.set_database_path(db_path)
+    rng = np.random.default_rng([config['seed'], worker])
+    latencies = {operation: [] for operation in OPERATIONS}
+    errors = {operation: Counter() for operation in OPERATIONS}
+    lock_errors = 0
+    sessions = 0
+    # Wall clock, comparable across processes; process start-up is excluded
+    started = time.time()
+    
+    def attempt(operation, function, *args):
+        nonlocal lock_errors
+        started = time.perf_counter()
+        try:
+            result = function(*args)
+        except Exception as error:
+            errors[operation][type(error).__name__] += 1
+            lock_errors += is_lock_error(error)
+            return None
+        latencies[operation].append(time.perf_counter() - started)
+        return result
+    
+    if config['feedback'] == 'writer':
+        rate = get_feedback_writer().submit
+    else:
+        rate = database.save_feedback
+    dashboard = database.load_dashboard_stats if config['uncached_dashboard'] else database.get_dashboard_stats
+    
+    deadline = time.monotonic() + config['duration']
+    while sessions < config['sessions'] and time.monotonic() < deadline:
+        sessions += 1
+        data = student(rng)
+        submitted = attempt('submit', submit, data, config['write_path'])
+        time.sleep(config['think_time'])
+        
+        if submitted:
+            assessment_id, recommendations = submitted
+            for recommendation in recommendations:
+                if rng.random() < config['rating_probability']:
+                    attempt('feedback', rate, assessment_id, recommendation['course'], int(rng.integers(1, 6)))
+            time.sleep(config['think_time'])
+        
+        attempt('dashboard', dashboard)
+        time.sleep(config['think_time'])
+    
+    feedback_writer = None
+    if config['feedback'] == 'writer' and db_path:
+        # Worker processes flush their own writer before returning
+        feedback_writer = drain_feedback_writer(close=True)
+    
+    return {
+        'sessions': sessions,
+        'started': started,
+        'finished': time.time(),
+        'latencies': latencies,
+        'errors': {operation: dict(counts) for operation, counts in errors.items()},
+        'lock_errors': lock_errors,
+        'feedback_writer': feedback_writer
+    }
+
+def prefill(rows, seed):
+    # Existing history so the dashboard and indexes work on a realistic table
+    assessments = synthetic_assessments(rows, seed)
+    for start in range(0, rows, PREFILL_CHUNK_SIZE):
+        chunk = assessments.iloc[start:start + PREFILL_CHUNK_SIZE]
+        results = get_batch_recommendations(chunk)
+        database.save_batch_results(chunk.to_dict('records'), results, results['version'])
+
+def run(db_path, workers, config, processes=False):
+    database.set_database_path(db_path)
+    database.init_database()
+    if config['prefill']:
+        prefill(config['prefill'], config['seed'])
+    # Worker processes open their own connections
+    database.get_connection_pool(db_path).close()
+    
+    feedback_writer = None
+    if processes:
+        with multiprocessing.get_context('spawn').Pool(workers) as pool:
+            results = pool.starmap(run_sessions, [(worker, config, db_path) for worker in range(workers)])
+        if config['feedback'] == 'writer':
+            feedback_writer = {
+                key: sum(result['feedback_writer'][key] for result in results)
+                for key in ['written', 'failures', 'pending']
+            }
+    else:
+        results = [None] * workers
+        # Threads share the app's writer, which may have counts from before this run
+        if config['feedback'] == 'writer':
+            writer = get_feedback_writer()
+            written, failures = writer.written, writer.failures
+        
+        def thread_main(worker):
+            results[worker] = run_sessions(worker, config)
+        
+        threads = [threading.Thread(target=thread_main, args=(worker,)) for worker in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if config['feedback'] == 'writer':
+            feedback_writer = drain_feedback_writer()
+            feedback_writer['written'] -= written
+            feedback_writer['failures'] -= failures
+        database.get_connection_pool(db_path).close()
+    seconds = max(result['finished'] for result in results) - min(result['started'] for result in results)
+    
+    sessions = sum(result['sessions'] for result in results)
+    operations = []
+    for operation in OPERATIONS:
+        samples = [sample for result in results for sample in result['latencies'][operation]]
+        errors = Counter()
+        for result in results:
+            errors.update(result['errors'][operation])
+        summary = latency(operation, sessions, samples) if samples else {'benchmark': operation, 'operations': 0}
+        summary.pop('size', None)
+        summary['ops_per_second'] = round(len(samples) / seconds, 2) if seconds else None
+        summary['errors'] = dict(errors)
+        operations.append(summary)
+    
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'config': dict(config, workers=workers, processes=processes),
+        'sqlite': sqlite3.sqlite_version,
+        'seconds': round(seconds, 3),
+        'sessions': sessions,
+        'sessions_per_second': round(sessions / seconds, 2) if seconds else None,
+        # Failed writer batches and ratings it never wrote count as lock errors too
+        'lock_errors': sum(result['lock_errors'] for result in results) + (
+            feedback_writer['failures'] + feedback_writer['pending'] if feedback_writer else 0
+        ),
+        'feedback_writer': feedback_writer,
+        'operations': operations
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent students against one shared database")
+    parser.add_argument('--db', help="database file to load (default: a new file in a temporary directory)")
+    parser.add_argument('--workers', type=int, default=16, help="concurrent students")
+    parser.add_argument('--processes', action='store_true', help="run workers as processes instead of threads")
+    parser.add_argument('--sessions', type=int, default=200, help="sessions per worker")
+    parser.add_argument('--duration', type=float, default=60.0, help="stop after this many seconds")
+    parser.add_argument('--think-time', type=float, default=0.0, help="seconds between a student's clicks")
+    parser.add_argument('--write-path', choices=['results', 'split'], default='results')
+    parser.add_argument('--feedback', choices=['writer', 'direct'], default='writer',
+                        help="batched feedback writer (as in the app) or one save_feedback call per rating")
+    parser.add_argument('--rating-probability', type=float, default=RATING_PROBABILITY)
+    parser.add_argument('--uncached-dashboard', action='store_true', help="query the dashboard stats on every view")
+    parser.add_argument('--prefill', type=int, default=0, help="synthetic assessments to store before the run")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    
+    config = {
+        'sessions': args.sessions,
+        'duration': args.duration,
+        'think_time': args.think_time,
+        'write_path': args.write_path,
+        'feedback': args.feedback,
+        'rating_probability': args.rating_probability,
+        'uncached_dashboard': args.uncached_dashboard,
+        'prefill': args.prefill,
+        'seed': args.seed
+    }
+    
+    if args.db:
+        report = run(args.db, args.workers, config, args.processes)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            report = run(os.path.join(workdir, 'loadtest.db'), args.workers, config, args.processes)
+    
+    for operation in report['operations']:
+        print(f"{operation['benchmark']:>10} {json.dumps(operation)}", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
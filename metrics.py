@@ -0,0 +1,224 @@
+import bisect
+import functools
+import hmac
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'course_recommender_'
+# Histogram bucket upper bounds in seconds, 1-2.5-5 steps from 50us to 10s
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUANTILES = (0.5, 0.95, 0.99)
+EXPORT_INTERVAL = 15.0
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+    
+    def quantile(self, q):
+        # Linear interpolation inside the bucket holding the q-th value, the
+        # same estimate as Prometheus' histogram_quantile
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+class MetricsRegistry:
+    # In-process counters and latency histograms, keyed by metric name and
+    # a sorted tuple of label pairs
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+    
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name, seconds, **labels):
+        self.observe_key((name, tuple(sorted(labels.items()))), seconds)
+    
+    def observe_key(self, key, seconds):
+        # key: (name, sorted label pairs), for callers that build it once
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+    
+    @contextmanager
+    def timer(self, name, **labels):
+        # Observes the elapsed time under name; failures also count towards
+        # <name without _seconds>_errors_total with the exception type
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as error:
+            self.increment(error_metric(name), error=type(error).__name__, **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+    
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+    
+    def snapshot(self):
+        # Plain dicts for display: counters, and histograms with their count,
+        # mean and quantiles in seconds
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = []
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                summary = {
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': histogram.count,
+                    'mean': histogram.sum / histogram.count
+                }
+                for q in QUANTILES:
+                    summary[f'p{round(q * 100)}'] = histogram.quantile(q)
+                histograms.append(summary)
+        return {'counters': counters, 'histograms': histograms}
+    
+    def prometheus_text(self):
+        # Prometheus text exposition format (version 0.0.4)
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, list(histogram.counts), histogram.count, histogram.sum)
+                for key, histogram in self._histograms.items()
+            )
+        
+        typed = set()
+        for (name, labels), value in counters:
+            metric = METRIC_PREFIX + name
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{format_labels(labels)} {value}")
+        
+        for (name, labels), counts, count, total in histograms:
+            metric = METRIC_PREFIX + name
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {total!r}")
+            lines.append(f"{metric}_count{format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+    
+    def write_prometheus(self, path):
+        # Written to a temporary file and renamed into place, so a scraper
+        # (e.g. node_exporter's textfile collector) never reads half a file
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        staging_path = path + '.tmp'
+        with open(staging_path, 'w') as metrics_file:
+            metrics_file.write(self.prometheus_text())
+        os.replace(staging_path, path)
+        return path
+
+def error_metric(name):
+    return name[:-len('_seconds')] + '_errors_total' if name.endswith('_seconds') else name + '_errors_total'
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+def metrics_page_allowed(query_params, token):
+    # ?page=metrics&token=<token> with the configured token; without one the
+    # page stays off. Compared as bytes: compare_digest rejects non-ASCII str.
+    if not token or query_params.get('page') != ['metrics']:
+        return False
+    return hmac.compare_digest(query_params.get('token', [''])[0].encode(), token.encode())
+
+_registry = MetricsRegistry()
+
+def get_registry():
+    return _registry
+
+def timer(name, **labels):
+    return get_registry().timer(name, **labels)
+
+def timed(name, **labels):
+    # Decorator form of timer, labelled with the function name. Written out
+    # instead of using timer so hot functions pay only a few microseconds.
+    def decorate(function):
+        function_labels = dict(labels, operation=function.__name__)
+        key = (name, tuple(sorted(function_labels.items())))
+        
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception as error:
+                get_registry().increment(error_metric(name), error=type(error).__name__, **function_labels)
+                raise
+            finally:
+                get_registry().observe_key(key, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+# Periodic export to a file for scraping. Started by the app bootstrap
+# when METRICS_PATH is set.
+_exporter = None
+_exporter_lock = threading.Lock()
+
+def start_exporter(path, interval=EXPORT_INTERVAL):
+    global _exporter
+    
+    def run():
+        while True:
+            try:
+                get_registry().write_prometheus(path)
+            except OSError:
+                logger.exception("failed to write metrics to %s", path)
+            time.sleep(interval)
+    
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = threading.Thread(target=run, name='metrics-exporter', daemon=True)
+            _exporter.start()
+        return _exporter
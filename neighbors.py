@@ -0,0 +1,221 @@
+import functools
+import itertools
+import logging
+import threading
+import time
+
+import numpy as np
+
+from database import iter_rating_statistics
+from metrics import timed
+from recommender import (
+    ANSWER_VALUES, FEATURES,
+    course_indices, generate_explanation, get_catalog, get_recommendations, score_courses, strand_key,
+    top_k_indices, unpack_answer_matrix
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Neighbor-based recommendations. The rule scores are blended with the
+# ratings that students with the closest answer profiles gave each course.
+NEIGHBOR_COUNT = 50
+# Weight of the rule score, counted as that many ratings. Courses few
+# neighbors rated stay close to their rule score.
+RULE_SCORE_WEIGHT = 5.0
+NEIGHBOR_INDEX_TTL = 300
+NEIGHBOR_EXPLANATION = " Students with similar answers rated this {:.1f}/5."
+NEIGHBOR_VERSION_PREFIX = 'neighbors-'
+
+# Answers are compared in groups of four. A group has only 5^4 = 625
+# possible answer combinations, so the L1 distance between any two is
+# read from a precomputed table instead of being computed per profile.
+ANSWER_GROUP_SIZE = 4
+ANSWER_GROUPS = [FEATURES[start:start + ANSWER_GROUP_SIZE] for start in range(0, len(FEATURES), ANSWER_GROUP_SIZE)]
+
+@functools.lru_cache(maxsize=None)
+def group_distance_table(size):
+    # (cells, cells) L1 distances between all answer combinations of a group
+    cells = np.array(list(itertools.product(ANSWER_VALUES, repeat=size)), dtype=np.int64)
+    return np.abs(cells[:, None, :] - cells[None, :, :]).sum(axis=2).astype(np.uint8)
+
+def group_cells(answers):
+    # (n, n_features) answers -> one (n,) cell index array per group
+    answers = np.asarray(answers, dtype=np.intp) - min(ANSWER_VALUES)
+    cells = []
+    for start in range(0, answers.shape[1], ANSWER_GROUP_SIZE):
+        group = answers[:, start:start + ANSWER_GROUP_SIZE]
+        radix = len(ANSWER_VALUES) ** np.arange(group.shape[1] - 1, -1, -1)
+        cells.append(group @ radix)
+    return cells
+
+class NeighborIndex:
+    # Rated answer profiles stored as grid cells per answer group. A query
+    # looks up its row of each group's distance table and gathers it over
+    # all profiles, which scans a million profiles in a few milliseconds.
+    # Ratings are kept only for the courses each profile rated (profile i
+    # owns entries offsets[i] to offsets[i + 1]), so memory follows the
+    # number of ratings rather than profiles x courses.
+    def __init__(self, codes, offsets, courses, rating_sum, rating_count, catalog):
+        # Course numbers are rows of the catalog the index was built for
+        self.catalog = catalog
+        self.codes = codes
+        self.cells = group_cells(unpack_answer_matrix(codes))
+        self.offsets = offsets
+        self.courses = courses
+        self.rating_sum = rating_sum
+        self.rating_count = rating_count
+    
+    @classmethod
+    def from_statistics(cls, chunks, catalog=None):
+        # chunks: RATING_STATISTICS_ROW arrays, see database.iter_rating_statistics
+        catalog = catalog or get_catalog()
+        codes, courses, counts, sums = [], [], [], []
+        for chunk in chunks:
+            known = course_indices(chunk['course'], catalog)
+            keep = known >= 0
+            codes.append(chunk['code'][keep])
+            courses.append(known[keep])
+            counts.append(chunk['n'][keep])
+            sums.append(chunk['sum'][keep])
+        
+        if not codes:
+            codes, courses, counts, sums = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.intp)], [[]], [[]]
+        profiles, rows = np.unique(np.concatenate(codes), return_inverse=True)
+        # One entry per rated (profile, course) pair, in profile order
+        n_courses = len(catalog.names)
+        pairs, entries = np.unique(rows.astype(np.int64) * n_courses + np.concatenate(courses), return_inverse=True)
+        rating_sum = np.bincount(entries, weights=np.concatenate(sums), minlength=len(pairs)).astype(np.float32)
+        rating_count = np.bincount(entries, weights=np.concatenate(counts), minlength=len(pairs)).astype(np.float32)
+        offsets = np.searchsorted(pairs // n_courses, np.arange(len(profiles) + 1))
+        return cls(profiles, offsets, (pairs % n_courses).astype(np.intp), rating_sum, rating_count, catalog)
+    
+    def __len__(self):
+        return len(self.codes)
+    
+    def distances(self, values):
+        # L1 distance from values to every profile
+        distances = np.zeros(len(self), dtype=np.uint8)
+        for group, cells, query in zip(ANSWER_GROUPS, self.cells, group_cells([values])):
+            distances += group_distance_table(len(group))[query[0]][cells]
+        return distances
+    
+    def nearest(self, values, neighbors=NEIGHBOR_COUNT):
+        # Rows of the nearest rated profiles by L1 distance, nearest first.
+        # Profiles at the same distance keep index order.
+        neighbors = min(neighbors, len(self))
+        if not neighbors:
+            return np.zeros(0, dtype=np.intp)
+        distances = self.distances(values)
+        # Smallest distance that takes in enough profiles, then only those
+        # profiles are sorted
+        counts = np.cumsum(np.bincount(distances))
+        cutoff = np.searchsorted(counts, neighbors)
+        rows = np.flatnonzero(distances <= cutoff)
+        return rows[np.argsort(distances[rows], kind='stable')[:neighbors]]
+    
+    def neighbor_ratings(self, values, neighbors=NEIGHBOR_COUNT):
+        # Per-course rating sums and counts over the nearest profiles
+        rows = self.nearest(values, neighbors)
+        starts, lengths = self.offsets[rows], self.offsets[rows + 1] - self.offsets[rows]
+        entries = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        courses, n_courses = self.courses[entries], len(self.catalog.names)
+        return (
+            np.bincount(courses, weights=self.rating_sum[entries], minlength=n_courses),
+            np.bincount(courses, weights=self.rating_count[entries], minlength=n_courses)
+        )
+
+@timed('scoring_seconds')
+def build_neighbor_index():
+    return NeighborIndex.from_statistics(iter_rating_statistics())
+
+class NeighborIndexCache:
+    # Serves the last built index. Once it is older than the TTL, or was
+    # built for a catalog that has since reloaded, one background thread
+    # builds the next one while requests keep using the old index; only
+    # the first request waits for a build.
+    def __init__(self, build, ttl=NEIGHBOR_INDEX_TTL):
+        self.build = build
+        self.ttl = ttl
+        self._index = None
+        self._built_at = 0.0
+        self._rebuilding = False
+        self._lock = threading.Lock()
+        self._first_build_lock = threading.Lock()
+    
+    def get(self):
+        catalog = get_catalog()
+        with self._lock:
+            index = self._index
+            # A catalog reload renumbers the courses
+            expired = time.monotonic() - self._built_at >= self.ttl
+            if index is not None and (expired or index.catalog is not catalog) and not self._rebuilding:
+                self._rebuilding = True
+                threading.Thread(target=self._rebuild, name='neighbor-index', daemon=True).start()
+        if index is not None:
+            return index
+        
+        with self._first_build_lock:
+            if self._index is None:
+                self._store(self.build())
+            return self._index
+    
+    def _store(self, index):
+        with self._lock:
+            self._index = index
+            self._built_at = time.monotonic()
+    
+    def _rebuild(self):
+        try:
+            self._store(self.build())
+        except Exception:
+            # The old index stays in use and the next try waits another TTL
+            logger.exception("Could not rebuild the neighbor index")
+            with self._lock:
+                self._built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+# Rebuilt from the feedback table once the TTL runs out, so new ratings
+# show up within a few minutes without rebuilding on every request
+_index_cache = NeighborIndexCache(build_neighbor_index)
+
+def get_neighbor_index():
+    return _index_cache.get()
+
+def neighbor_scoring_version(index=None):
+    # Version stored with blended recommendations, so they are not taken for
+    # rows the rules scored with the same catalog
+    index = get_neighbor_index() if index is None else index
+    return NEIGHBOR_VERSION_PREFIX + index.catalog.version
+
+@timed('scoring_seconds')
+def get_neighbor_recommendations(user_data, k=3, neighbors=NEIGHBOR_COUNT, index=None):
+    # Same result format as recommender.get_recommendations
+    values = [user_data[feature] for feature in FEATURES]
+    if not all(value in ANSWER_VALUES for value in values):
+        return get_recommendations(user_data, k)
+    index = get_neighbor_index() if index is None else index
+    catalog = index.catalog
+    # Only the courses open to the student's strand are scored
+    strand = catalog.scope_key(strand_key(user_data.get('strand'), user_data.get('tvl_strand')))
+    candidates = catalog.scope(strand)[0]
+    rating_sum, rating_count = index.neighbor_ratings(values, neighbors)
+    rating_sum, rating_count = rating_sum[candidates], rating_count[candidates]
+    
+    rule_scores = score_courses(values, catalog, strand)
+    scores = (RULE_SCORE_WEIGHT * rule_scores + rating_sum) / (RULE_SCORE_WEIGHT + rating_count)
+    
+    recommendations = []
+    for position in top_k_indices(scores, k)[0]:
+        course = catalog.names[candidates[position]]
+        explanation = generate_explanation(course, values, catalog)
+        if rating_count[position]:
+            explanation += NEIGHBOR_EXPLANATION.format(rating_sum[position] / rating_count[position])
+        recommendations.append({
+            'course': course,
+            'score': float(scores[position]),
+            'explanation': explanation
+        })
+    return recommendations
@@ -0,0 +1,639 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import string
+import sys
+import threading
+import time
+
+import numpy as np
+
+from metrics import timed
+
+
+logger = logging.getLogger(__name__)
+
+# Assessment features, in the column order of the assessments table
+INTEREST_FEATURES = [
+    'science_interest', 'arts_interest', 'teaching_interest', 'business_interest',
+    'technology_interest', 'design_interest', 'sports_interest'
+]
+ABILITY_FEATURES = [
+    'logical_ability', 'creativity_ability', 'communication_ability',
+    'practical_ability', 'teamwork_ability'
+]
+FEATURES = INTEREST_FEATURES + ABILITY_FEATURES
+ASSESSMENT_COLUMNS = ['name', 'school', 'strand', 'tvl_strand'] + FEATURES
+
+ANSWER_VALUES = [1, 2, 3, 4, 5]
+DEFAULT_EXPLANATION = "This course matches your profile based on your interests and abilities."
+DEFAULT_IMAGE = "🎓"
+
+# Course catalog data file. Each course has a description, an image, its
+# matching weights, an explanation template (fields are assessment feature
+# names) and optionally the strands it admits, every strand when omitted.
+# Weight terms are summed in the order they are listed, which keeps scores
+# (and ties between equal scores) bit-for-bit stable.
+CATALOG_PATH = os.environ.get(
+    'COURSE_CATALOG_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'courses.json')
+)
+
+# Learned weights replace the catalog weights of the courses they cover
+# when an artifact is present
+WEIGHTS_PATH = os.environ.get(
+    'COURSE_WEIGHTS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'course_weights.json')
+)
+
+# Both files are checked for changes this often, and the catalog is
+# reloaded without restarting the app when either one changed
+CATALOG_CHECK_INTERVAL = 5.0
+
+# Templates reading more answers than this are formatted per request; a
+# course's table has 5^fields entries
+MAX_PRERENDERED_FIELDS = 4
+
+def build_weight_matrix(course_weights):
+    # One (courses x features) matrix per term slot: slot j holds the j-th
+    # term of every course. Each slot product has a single non-zero per row,
+    # so adding the slots left to right reproduces the hand-written sums.
+    courses = list(course_weights)
+    n_slots = max(len(terms) for terms in course_weights.values())
+    weights = np.zeros((n_slots, len(courses), len(FEATURES)))
+    for row, course in enumerate(courses):
+        for slot, (feature, weight) in enumerate(course_weights[course]):
+            weights[slot, row, FEATURES.index(feature)] = weight
+    return courses, weights
+
+def load_weight_artifact(path):
+    # Learned weights written by training.py: one dense weight vector and a
+    # bias per course
+    with open(path) as artifact_file:
+        artifact = json.load(artifact_file)
+    if not isinstance(artifact, dict) or artifact.get('features') != FEATURES:
+        raise ValueError(f"{path}: weight artifact features do not match the assessment features")
+    if 'version' not in artifact:
+        raise ValueError(f"{path}: weight artifact has no version")
+    # Every learned course needs a bias and a weight for each feature
+    try:
+        values = [
+            [learned['bias']] + [learned['weights'][feature] for feature in FEATURES]
+            for learned in artifact['courses'].values()
+        ]
+        np.asarray(values, dtype=np.float64)
+    except (AttributeError, KeyError, TypeError, ValueError) as error:
+        raise ValueError(f"{path}: malformed weight artifact ({error!r})") from error
+    return artifact
+
+def apply_weight_artifact(artifact, names, weights):
+    # A learned course keeps its dense weights in slot 0 with the other
+    # slots zeroed, which adds up to the same score as a single slot
+    weights = weights.copy()
+    bias = np.zeros(len(names))
+    for row, course in enumerate(names):
+        learned = artifact['courses'].get(course)
+        if learned is not None:
+            weights[:, row] = 0
+            weights[0, row] = [learned['weights'][feature] for feature in FEATURES]
+            bias[row] = learned['bias']
+    return weights, bias
+
+def compile_explanations(names, templates):
+    # Every answer is 1-5 and a template only reads a few of them, so each
+    # course's explanations are rendered up front for every combination of
+    # its fields. Rendering is then a table lookup keyed by those answers.
+    # fields[c] lists the feature columns a course reads (padded with 0),
+    # radix[c] turns their answers into a lookup code (0 for padding) and
+    # the course's entries start at table[offsets[c]]. Each course's slice
+    # is sized for its own fields; courses over MAX_PRERENDERED_FIELDS get
+    # no slice (offset -1) and are formatted directly.
+    parsed = [
+        [FEATURES.index(field) for _, field, _, _ in string.Formatter().parse(templates.get(course, '')) if field]
+        for course in names
+    ]
+    n_fields = max([len(fields) for fields in parsed if len(fields) <= MAX_PRERENDERED_FIELDS] + [1])
+    base = len(ANSWER_VALUES)
+    fields = np.zeros((len(names), n_fields), dtype=np.intp)
+    radix = np.zeros((len(names), n_fields), dtype=np.intp)
+    offsets = np.full(len(names), -1, dtype=np.intp)
+    table = []
+    for row, course in enumerate(names):
+        course_fields = parsed[row]
+        if len(course_fields) > MAX_PRERENDERED_FIELDS:
+            continue
+        fields[row, :len(course_fields)] = course_fields
+        radix[row, :len(course_fields)] = base ** np.arange(len(course_fields))
+        offsets[row] = len(table)
+        template = templates.get(course, DEFAULT_EXPLANATION)
+        for code in range(base ** len(course_fields)):
+            digits = [(code // base ** j) % base for j in range(len(course_fields))]
+            answers = {FEATURES[field]: ANSWER_VALUES[digit] for field, digit in zip(course_fields, digits)}
+            table.append(template.format(**answers))
+    return fields, radix, offsets, np.array(table, dtype=object)
+
+def strand_candidates(strands, courses):
+    # Catalog rows open to each strand, in catalog order.
+    # Tracks named 'GROUP-TRACK' also make up a group ('TVL' for 'TVL-ICT',
+    # 'TVL-HE', ...) that a course can list to admit all of them, and that
+    # a student who gave no track is matched against.
+    groups = {}
+    for strand in strands:
+        if '-' in strand:
+            groups.setdefault(strand.split('-')[0], []).append(strand)
+    
+    admitted = {strand: set() for strand in strands}
+    for row, course in enumerate(courses):
+        listed = course.get('strands', strands)
+        unknown = [strand for strand in listed if strand not in admitted and strand not in groups]
+        if unknown:
+            raise ValueError(f"{course['name']}: unknown strands {', '.join(unknown)}")
+        for strand in listed:
+            for track in groups.get(strand, [strand]):
+                admitted[track].add(row)
+    
+    empty = [strand for strand, rows in admitted.items() if not rows]
+    if empty:
+        raise ValueError(f"no course admits {', '.join(empty)}")
+    for group, tracks in groups.items():
+        admitted.setdefault(group, set().union(*(admitted[track] for track in tracks)))
+    return {strand: np.array(sorted(rows), dtype=np.intp) for strand, rows in admitted.items()}
+
+@functools.lru_cache(maxsize=256)
+def strand_key(strand, tvl_strand=None):
+    # Catalog strand for the app's strand labels: the abbreviation, with the
+    # track for TVL ('TVL-ICT'). None when no strand was given.
+    if not isinstance(strand, str) or not strand.strip():
+        return None
+    key = strand.split('(')[0].strip().upper()
+    if key == 'TVL' and isinstance(tvl_strand, str) and tvl_strand.strip() and tvl_strand != 'Not applicable':
+        key += '-' + tvl_strand.split('(')[0].strip().upper()
+    return key
+
+class Catalog:
+    # One loaded version of the catalog and everything scoring needs from
+    # it. A reload builds a new Catalog and swaps it in whole, so a request
+    # finishes with the catalog it started with.
+    def __init__(self, data, artifact=None):
+        courses = data['courses']
+        self.names = [course['name'] for course in courses]
+        if not self.names:
+            raise ValueError("the catalog has no courses")
+        if len(set(self.names)) < len(self.names):
+            raise ValueError("course names must be unique")
+        self.index = {name: row for row, name in enumerate(self.names)}
+        self.name_array = np.asarray(self.names, dtype=object)
+        self.courses = {
+            course['name']: {
+                'description': course.get('description', ''),
+                'image': course.get('image', DEFAULT_IMAGE)
+            }
+            for course in courses
+        }
+        
+        self.course_weights = {course['name']: list(course['weights'].items()) for course in courses}
+        unknown = {feature for terms in self.course_weights.values() for feature, _ in terms} - set(FEATURES)
+        if unknown:
+            raise ValueError(f"unknown features in course weights: {', '.join(sorted(unknown))}")
+        self.templates = {course['name']: course['explanation'] for course in courses if course.get('explanation')}
+        
+        _, self.weight_matrix = build_weight_matrix(self.course_weights)
+        self.bias = np.zeros(len(self.names))
+        self.weights_version = 'rules'
+        if artifact is not None:
+            self.weight_matrix, self.bias = apply_weight_artifact(artifact, self.names, self.weight_matrix)
+            self.weights_version = artifact['version']
+        (
+            self.explanation_fields, self.explanation_radix, self.explanation_offsets, self.explanation_table
+        ) = compile_explanations(self.names, self.templates)
+        
+        # Strand -> candidate index. Strands that admit only part of the
+        # catalog get their own slice of the weights, so scoring a student
+        # never touches the courses they cannot take.
+        self.strands = list(data.get('strands', []))
+        self.candidates = strand_candidates(self.strands, courses)
+        self._everything = (np.arange(len(self.names)), self.weight_matrix, self.bias)
+        self._scopes = {
+            strand: (rows, self.weight_matrix[:, rows], self.bias[rows])
+            for strand, rows in self.candidates.items()
+            if len(rows) < len(self.names)
+        }
+        
+        # Changes whenever the weights, explanation text or eligibility
+        # change, so stored rankings from an older setup are never served
+        restricted = {strand: [self.names[row] for row in rows] for strand, (rows, _, _) in self._scopes.items()}
+        self.version = hashlib.sha1(json.dumps(
+            [self.course_weights, self.templates]
+            + ([self.weights_version] if self.weights_version != 'rules' else [])
+            + ([restricted] if restricted else []),
+            sort_keys=True
+        ).encode()).hexdigest()[:12]
+    
+    @classmethod
+    def from_files(cls, path, weights_path=None):
+        with open(path, encoding='utf-8') as catalog_file:
+            data = json.load(catalog_file)
+        artifact = None
+        if weights_path and os.path.exists(weights_path):
+            try:
+                artifact = load_weight_artifact(weights_path)
+            except (OSError, ValueError):
+                # The catalog still loads, scored with its own rule weights
+                logger.exception("Ignoring the weight artifact %s", weights_path)
+        try:
+            return cls(data, artifact)
+        except KeyError as error:
+            raise ValueError(f"{path}: missing field {error}") from error
+        except ValueError as error:
+            raise ValueError(f"{path}: {error}") from error
+    
+    @property
+    def restricted(self):
+        return bool(self._scopes)
+    
+    def scope_key(self, strand):
+        # The strand (or, for an unknown track, its group) when it admits
+        # only part of the catalog; None when every course is open
+        if strand not in self.candidates and isinstance(strand, str):
+            strand = strand.split('-')[0]
+        return strand if strand in self._scopes else None
+    
+    def scope(self, strand=None):
+        # (catalog rows, weights, bias) of the courses open to a scope_key
+        return self._scopes.get(strand, self._everything)
+
+_catalog = None
+_catalog_files = None
+_catalog_checked_at = 0.0
+_catalog_reloading = False
+_catalog_lock = threading.Lock()
+
+def catalog_files():
+    # Modification time and size of the catalog and weights files
+    files = []
+    for path in (CATALOG_PATH, WEIGHTS_PATH):
+        try:
+            stat = os.stat(path)
+            files.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            files.append(None)
+    return tuple(files)
+
+def build_catalog():
+    # (new Catalog, file stats it was built from). The Catalog is None when
+    # a reload fails. Only the first load runs this under _catalog_lock.
+    files = catalog_files()
+    try:
+        return Catalog.from_files(CATALOG_PATH, WEIGHTS_PATH), files
+    except (OSError, ValueError):
+        if _catalog is None:
+            raise
+        # A bad edit keeps the running catalog until the files change again
+        logger.exception("Could not reload the course catalog, still serving version %s", _catalog.version)
+        return None, files
+
+def install_catalog(catalog, files):
+    # Called with _catalog_lock held
+    global _catalog, _catalog_files, _catalog_checked_at
+    if catalog is not None:
+        _catalog = catalog
+        cached_rank_courses.cache_clear()
+    _catalog_files = files
+    _catalog_checked_at = time.monotonic()
+
+def _reload_in_background():
+    global _catalog_reloading
+    try:
+        catalog, files = build_catalog()
+        with _catalog_lock:
+            install_catalog(catalog, files)
+    except Exception:
+        logger.exception("Could not reload the course catalog")
+    finally:
+        with _catalog_lock:
+            _catalog_reloading = False
+
+def get_catalog():
+    # Once loaded, a changed file is rebuilt by one background thread while
+    # every request keeps the current catalog; only the first load waits
+    global _catalog_checked_at, _catalog_reloading
+    catalog = _catalog
+    if catalog is not None and time.monotonic() - _catalog_checked_at < CATALOG_CHECK_INTERVAL:
+        return catalog
+    with _catalog_lock:
+        if _catalog is None:
+            install_catalog(*build_catalog())
+        elif not _catalog_reloading and time.monotonic() - _catalog_checked_at >= CATALOG_CHECK_INTERVAL:
+            _catalog_checked_at = time.monotonic()
+            if catalog_files() != _catalog_files:
+                _catalog_reloading = True
+                threading.Thread(target=_reload_in_background, name='catalog-reload', daemon=True).start()
+        return _catalog
+
+def reload_catalog():
+    # Reloads now instead of at the next check
+    catalog, files = build_catalog()
+    with _catalog_lock:
+        install_catalog(catalog, files)
+        return _catalog
+
+def scoring_version():
+    return get_catalog().version
+
+def course_indices(course_names, catalog=None):
+    # Catalog index for each name, -1 for names not in the catalog
+    index = (catalog or get_catalog()).index
+    return np.fromiter((index.get(name, -1) for name in course_names), dtype=np.int64, count=len(course_names))
+
+def score_courses(features, catalog=None, strand=None):
+    # features: (n_features,) vector or (n_rows, n_features) matrix. Scores
+    # the courses open to strand (a Catalog.scope_key), in the order of
+    # their catalog rows in catalog.scope(strand).
+    _, weights, bias = (catalog or get_catalog()).scope(strand)
+    features = np.asarray(features, dtype=np.float64)
+    scores = features @ weights[0].T
+    for slot in weights[1:]:
+        scores = scores + features @ slot.T
+    return scores + bias
+
+def top_k_indices(scores, k):
+    # Indices of the k best courses per row, best first. Equal scores keep
+    # catalog order, same as a stable sort over the full score list.
+    scores = np.atleast_2d(scores)
+    n_rows, n_courses = scores.shape
+    k = min(k, n_courses)
+    if k == n_courses:
+        return np.argsort(-scores, axis=1, kind='stable')
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    # Rows with a tie straddling the k-th place take the lowest indices
+    # among the scores equal to the k-th best, as a stable sort would
+    threshold = top_scores.min(axis=1, keepdims=True)
+    tied = (scores >= threshold).sum(axis=1) > k
+    if tied.any():
+        tied_scores, tied_threshold = scores[tied], threshold[tied]
+        above = tied_scores > tied_threshold
+        equal = tied_scores == tied_threshold
+        needed = k - above.sum(axis=1, keepdims=True)
+        keep = above | (equal & (np.cumsum(equal, axis=1) <= needed))
+        top[tied] = np.nonzero(keep)[1].reshape(-1, k)
+        top_scores[tied] = np.take_along_axis(tied_scores, top[tied], axis=1)
+    order = np.lexsort((top, -top_scores), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+# Rule-based recommendation algorithm
+def rank_courses(values, k=3, strand=None, catalog=None):
+    # values: answers in FEATURES order; strand: a Catalog.scope_key.
+    # Returns (course, score, explanation) tuples for the top k courses,
+    # best first.
+    catalog = catalog or get_catalog()
+    rows = catalog.scope(strand)[0]
+    scores = score_courses(values, catalog, strand)
+    ranked = []
+    for index in top_k_indices(scores, k)[0]:
+        course = catalog.names[rows[index]]
+        ranked.append((course, float(scores[index]), generate_explanation(course, values, catalog)))
+    return tuple(ranked)
+
+@timed('scoring_seconds')
+def get_recommendations(user_data, k=3, with_version=False):
+    # Only the courses open to the student's strand are scored. with_version
+    # also returns the version of the catalog that scored them, which is
+    # what the stored rows are tagged with.
+    catalog = get_catalog()
+    strand = catalog.scope_key(strand_key(user_data.get('strand'), user_data.get('tvl_strand')))
+    values = [user_data[feature] for feature in FEATURES]
+    if all(value in ANSWER_VALUES for value in values):
+        ranked = recommend_profile(pack_answers(values), k, strand, catalog)
+    else:
+        ranked = rank_courses(values, k, strand, catalog)
+    
+    recommendations = [
+        {'course': course, 'score': score, 'explanation': explanation}
+        for course, score, explanation in ranked
+    ]
+    return (recommendations, catalog.version) if with_version else recommendations
+
+def generate_explanation(course, values, catalog=None):
+    # values: answers in FEATURES order
+    catalog = catalog or get_catalog()
+    if course not in catalog.templates:
+        return DEFAULT_EXPLANATION
+    index = catalog.index[course]
+    offset = catalog.explanation_offsets[index]
+    answers = [values[field] for field in catalog.explanation_fields[index]]
+    if offset >= 0 and all(answer in ANSWER_VALUES for answer in answers):
+        code = sum((answer - 1) * radix for answer, radix in zip(answers, catalog.explanation_radix[index]))
+        return catalog.explanation_table[offset + code]
+    return catalog.templates[course].format(**dict(zip(FEATURES, values)))
+
+def render_explanations(features, top, catalog):
+    # Bulk version of generate_explanation for the (rows x k) catalog
+    # indices of the recommended courses
+    rows = np.arange(len(top))[:, None, None]
+    answers = features[rows, catalog.explanation_fields[top]]
+    offsets = catalog.explanation_offsets[top]
+    valid = np.isin(answers, ANSWER_VALUES).all(axis=2) & (offsets >= 0)
+    codes = ((answers - 1) * catalog.explanation_radix[top]).sum(axis=2).astype(np.intp)
+    explanations = np.empty(top.shape, dtype=object)
+    explanations[valid] = catalog.explanation_table[offsets[valid] + codes[valid]]
+    
+    # Answers outside 1-5, and courses without a table, format the template directly
+    for row, rank in zip(*np.nonzero(~valid)):
+        values = features[row].astype(int).tolist()
+        explanations[row, rank] = generate_explanation(catalog.names[top[row, rank]], values, catalog)
+    return explanations
+
+# Memoized scoring. Answers are 1-5 on every feature, so an assessment
+# packs into one integer (3 bits per answer, first feature in the high
+# bits) and identical profiles reuse the same ranking.
+ANSWER_BITS = 3
+RECOMMENDATION_CACHE_SIZE = 65536
+
+# Rankings loaded from the database for the most common profiles, keyed by
+# packed answers, and the scoring version they were made with; see
+# database.load_profile_recommendations
+PRECOMPUTED_RECOMMENDATIONS = {}
+_precomputed_version = None
+
+def pack_answers(values):
+    code = 0
+    for value in values:
+        code = (code << ANSWER_BITS) | int(value)
+    return code
+
+def unpack_answers(code):
+    mask = (1 << ANSWER_BITS) - 1
+    return [(code >> (ANSWER_BITS * shift)) & mask for shift in reversed(range(len(FEATURES)))]
+
+ANSWER_SHIFTS = ANSWER_BITS * np.arange(len(FEATURES) - 1, -1, -1, dtype=np.int64)
+
+def pack_answer_matrix(features):
+    return (np.asarray(features, dtype=np.int64) << ANSWER_SHIFTS).sum(axis=1)
+
+def unpack_answer_matrix(codes):
+    # (n,) packed codes -> (n, n_features) uint8 answers
+    codes = np.asarray(codes, dtype=np.int64)
+    return ((codes[:, None] >> ANSWER_SHIFTS) & ((1 << ANSWER_BITS) - 1)).astype(np.uint8)
+
+def recommend_profile(code, k=3, strand=None, catalog=None):
+    catalog = catalog or get_catalog()
+    # Stored rankings cover the whole catalog, so they only serve strands
+    # that admit every course
+    if strand is None and _precomputed_version == catalog.version:
+        ranked = PRECOMPUTED_RECOMMENDATIONS.get(code)
+        if ranked is not None and len(ranked) >= k:
+            return ranked[:k]
+    return cached_rank_courses(catalog, strand, code, k)
+
+@functools.lru_cache(maxsize=RECOMMENDATION_CACHE_SIZE)
+def cached_rank_courses(catalog, strand, code, k):
+    return rank_courses(unpack_answers(code), k, strand, catalog)
+
+def preload_recommendations(rankings, version):
+    global _precomputed_version
+    PRECOMPUTED_RECOMMENDATIONS.clear()
+    PRECOMPUTED_RECOMMENDATIONS.update(rankings)
+    _precomputed_version = version
+
+def recommendation_cache_info():
+    info = cached_rank_courses.cache_info()
+    catalog = get_catalog()
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'maxsize': info.maxsize,
+        'precomputed': len(PRECOMPUTED_RECOMMENDATIONS) if _precomputed_version == catalog.version else 0,
+        'catalog_courses': len(catalog.names),
+        'scoring_version': catalog.version
+    }
+
+# Explanations naming the two answers that contributed most to each score
+FEATURE_LABELS = {
+    'science_interest': "science interest",
+    'arts_interest': "arts interest",
+    'teaching_interest': "teaching interest",
+    'business_interest': "business interest",
+    'technology_interest': "technology interest",
+    'design_interest': "design interest",
+    'sports_interest': "sports interest",
+    'logical_ability': "logical thinking",
+    'creativity_ability': "creativity",
+    'communication_ability': "communication skills",
+    'practical_ability': "practical skills",
+    'teamwork_ability': "teamwork"
+}
+DRIVER_TEMPLATE = "Recommended mainly because of your {} ({}/5) and {} ({}/5)."
+
+@functools.lru_cache(maxsize=None)
+def driver_explanation_table():
+    # Indexed by (first feature, first answer, second feature, second answer)
+    n_features, base = len(FEATURES), len(ANSWER_VALUES)
+    table = np.empty((n_features, base, n_features, base), dtype=object)
+    for first, first_value, second, second_value in np.ndindex(table.shape):
+        table[first, first_value, second, second_value] = DRIVER_TEMPLATE.format(
+            FEATURE_LABELS[FEATURES[first]], ANSWER_VALUES[first_value],
+            FEATURE_LABELS[FEATURES[second]], ANSWER_VALUES[second_value]
+        )
+    return table
+
+def render_driver_explanations(features, top, catalog):
+    contributions = catalog.weight_matrix.sum(axis=0)[top] * features[:, None, :]
+    drivers = np.argsort(-contributions, axis=2, kind='stable')[:, :, :2]
+    answers = features[np.arange(len(top))[:, None, None], drivers]
+    if not np.isin(answers, ANSWER_VALUES).all():
+        raise ValueError("driver explanations need every answer to be a whole number from 1 to 5")
+    answers = answers.astype(np.intp) - 1
+    return driver_explanation_table()[drivers[..., 0], answers[..., 0], drivers[..., 1], answers[..., 1]]
+
+EXPLANATION_STYLES = {
+    'template': render_explanations,
+    'drivers': render_driver_explanations
+}
+
+# Batch recommendations for a whole table of assessments
+def feature_matrix(assessments):
+    # Accepts a DataFrame with the assessments table columns, or a 2-D array
+    # holding either the 12 feature columns or every assessments column.
+    # pandas is only imported by callers that have a DataFrame to pass.
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(assessments, pd.DataFrame):
+        return assessments[FEATURES].to_numpy(dtype=np.float64)
+    values = np.asarray(assessments)
+    if values.ndim != 2 or values.shape[1] not in (len(FEATURES), len(ASSESSMENT_COLUMNS)):
+        raise ValueError(
+            f"expected a 2-D array with {len(FEATURES)} or {len(ASSESSMENT_COLUMNS)} columns, "
+            f"got shape {values.shape}"
+        )
+    return values[:, -len(FEATURES):].astype(np.float64)
+
+def assessment_strands(assessments):
+    # Strand keys from the strand columns of a DataFrame or full-column
+    # array, None when there are no strand columns
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(assessments, pd.DataFrame):
+        if 'strand' not in assessments.columns:
+            return None
+        tvl_strands = assessments['tvl_strand'] if 'tvl_strand' in assessments.columns else [None] * len(assessments)
+        return [strand_key(strand, tvl_strand) for strand, tvl_strand in zip(assessments['strand'], tvl_strands)]
+    values = np.asarray(assessments)
+    if values.shape[1] != len(ASSESSMENT_COLUMNS):
+        return None
+    strand_column = ASSESSMENT_COLUMNS.index('strand')
+    return [strand_key(strand, tvl_strand) for strand, tvl_strand in values[:, strand_column:strand_column + 2]]
+
+def scope_rows(catalog, strands, n_rows):
+    # {scope_key: assessment rows} for batch scoring
+    if strands is None or not catalog.restricted:
+        return {None: np.arange(n_rows)}
+    keys = np.array([catalog.scope_key(strand) or '' for strand in strands])
+    scopes, inverse = np.unique(keys, return_inverse=True)
+    return {scope or None: np.flatnonzero(inverse == group) for group, scope in enumerate(scopes)}
+
+# Rows scored at a time, so the (rows x courses) score matrices stay a few
+# tens of MB however large the catalog grows
+BATCH_SCORE_CELLS = 1 << 22
+
+@timed('scoring_seconds')
+def get_batch_recommendations(assessments, k=3, explain=True, strands=None):
+    # explain: True or 'template' for the course templates, 'drivers' to name
+    # the answers that contributed most, False to skip explanations.
+    # strands: a strand_key per row, by default read from the strand columns;
+    # each row is scored against the courses its strand admits.
+    catalog = get_catalog()
+    features = feature_matrix(assessments)
+    if strands is None and catalog.restricted:
+        strands = assessment_strands(assessments)
+    
+    k = min(k, len(catalog.names))
+    top = np.zeros((len(features), k), dtype=np.intp)
+    scores = np.zeros((len(features), k))
+    for strand, members in scope_rows(catalog, strands, len(features)).items():
+        candidates = catalog.scope(strand)[0]
+        if len(candidates) < k:
+            raise ValueError(f"the {strand} strand admits {len(candidates)} courses, fewer than k={k}")
+        block = max(BATCH_SCORE_CELLS // len(candidates), 1)
+        for start in range(0, len(members), block):
+            rows = members[start:start + block]
+            block_scores = score_courses(features[rows], catalog, strand)
+            block_top = top_k_indices(block_scores, k)
+            top[rows] = candidates[block_top]
+            scores[rows] = np.take_along_axis(block_scores, block_top, axis=1)
+    
+    results = {
+        'courses': catalog.name_array[top],
+        'scores': scores,
+        'explanations': None,
+        'version': catalog.version
+    }
+    
+    if explain:
+        style = 'template' if explain is True else explain
+        if style not in EXPLANATION_STYLES:
+            raise ValueError(f"unknown explanation style: {style!r}")
+        results['explanations'] = EXPLANATION_STYLES[style](features, top, catalog)
+    
+    return results
@@ -0,0 +1,161 @@
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+import database
+from neighbors import (
+    NEIGHBOR_VERSION_PREFIX, get_neighbor_index, get_neighbor_recommendations, neighbor_scoring_version
+)
+from recommender import FEATURES, get_batch_recommendations, scoring_version
+
+
+# Historical re-scoring. Stored recommendations are tagged with the
+# scoring version that made them; after the weights, explanations or
+# catalog change, this job regenerates them for every stored assessment.
+#
+# Assessments are split into fixed id ranges. Worker processes read and
+# score ranges in parallel (SQLite in WAL mode serves readers alongside
+# the writer); the parent is the only writer and replaces each range's
+# rows in one transaction together with its entry in rescoring_chunks.
+# A killed job restarts with the ranges that are not recorded yet.
+# Assessments the app scored in neighbor mode keep being blended with
+# neighbor ratings.
+CHUNK_SIZE = 20000
+
+def start_job(version, chunk_size, k):
+    # Returns the job for this version, creating it on the first run. A
+    # resumed job keeps its original id range, chunk size and k so its
+    # ranges line up with the finished ones; later assessments were scored
+    # by the app with this version already.
+    with database.get_connection(immediate=True) as conn:
+        job = conn.execute('''
+            SELECT chunk_size, first_id, last_id, top_k, finished_at
+            FROM rescoring_jobs WHERE recommendation_version = ?
+        ''', (version,)).fetchone()
+        if job is None:
+            first_id, last_id = conn.execute("SELECT MIN(id), MAX(id) FROM assessments").fetchone()
+            job = (chunk_size, first_id or 1, last_id or 0, k, None)
+            conn.execute('''
+                INSERT INTO rescoring_jobs (recommendation_version, chunk_size, first_id, last_id, top_k)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (version,) + job[:4])
+        
+        done = {start for start, in conn.execute(
+            "SELECT start_id FROM rescoring_chunks WHERE recommendation_version = ?", (version,)
+        )}
+    
+    chunk_size, first_id, last_id, k, finished_at = job
+    chunks = [
+        (start, min(start + chunk_size - 1, last_id))
+        for start in range(first_id, last_id + 1, chunk_size)
+        if start not in done
+    ]
+    return {
+        'version': version,
+        'chunk_size': chunk_size,
+        'first_id': first_id,
+        'last_id': last_id,
+        'top_k': k,
+        'finished_at': finished_at,
+        'pending': chunks,
+        'done': len(done)
+    }
+
+def score_chunk(db_path, version, catalog_version, start, end, k):
+    # Worker: recommendation rows for the assessments in [start, end] that
+    # do not have recommendations of this version yet. Rows blended with
+    # neighbor ratings are current when their catalog is, and stale ones
+    # are blended again.
+    if scoring_version() != catalog_version:
+        raise RuntimeError("the course catalog or weights changed during re-scoring; run it again")
+    database.set_database_path(db_path)
+    ids, answers = database.load_answer_matrix("WHERE id BETWEEN ? AND ?", (start, end))
+    strands = np.array(database.load_strand_keys("WHERE id BETWEEN ? AND ?", (start, end)), dtype=object)
+    with database.get_connection() as conn:
+        current = np.fromiter((assessment_id for assessment_id, in conn.execute('''
+            SELECT DISTINCT assessment_id FROM recommendations
+            WHERE assessment_id BETWEEN ? AND ? AND recommendation_version IN (?, ?)
+        ''', (start, end, version, NEIGHBOR_VERSION_PREFIX + catalog_version))), dtype=np.int64)
+        blended = np.fromiter((assessment_id for assessment_id, in conn.execute('''
+            SELECT DISTINCT assessment_id FROM recommendations
+            WHERE assessment_id BETWEEN ? AND ? AND recommendation_version LIKE ?
+        ''', (start, end, NEIGHBOR_VERSION_PREFIX + '%'))), dtype=np.int64)
+    
+    stale = ~np.isin(ids, current)
+    ids, answers, strands = ids[stale], answers[stale], strands[stale]
+    rules = ~np.isin(ids, blended)
+    rows = []
+    if rules.any():
+        results = get_batch_recommendations(answers[rules], k=k, strands=strands[rules])
+        rows = database.batch_recommendation_params(ids[rules].tolist(), results, version)
+    if not rules.all():
+        index = get_neighbor_index()
+        neighbor_version = neighbor_scoring_version(index)
+        for assessment_id, values, strand in zip(ids[~rules], answers[~rules], strands[~rules]):
+            user_data = dict(zip(FEATURES, values.tolist()), strand=strand)
+            recommendations = get_neighbor_recommendations(user_data, k, index=index)
+            rows += database.recommendation_params(int(assessment_id), recommendations, neighbor_version)
+    return start, end, ids.tolist(), rows
+
+def write_chunk(version, start, assessment_ids, rows):
+    # Older rows of the re-scored assessments move to recommendation_history
+    with database.get_connection(immediate=True) as conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS rescored_ids (id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM rescored_ids")
+        conn.executemany("INSERT INTO rescored_ids (id) VALUES (?)", [(assessment_id,) for assessment_id in assessment_ids])
+        conn.execute('''
+            INSERT INTO recommendation_history (
+                id, assessment_id, course_name, confidence_score, explanation, explanation_id,
+                recommendation_version, replaced_by
+            )
+            SELECT id, assessment_id, course_name, confidence_score, explanation, explanation_id,
+                   recommendation_version, ?
+            FROM recommendations
+            WHERE assessment_id IN (SELECT id FROM rescored_ids)
+        ''', (version,))
+        conn.execute("DELETE FROM recommendations WHERE assessment_id IN (SELECT id FROM rescored_ids)")
+        database.insert_recommendation_rows(conn, rows)
+        conn.execute('''
+            INSERT INTO rescoring_chunks (recommendation_version, start_id, assessments)
+            VALUES (?, ?, ?)
+        ''', (version, start, len(assessment_ids)))
+
+def finish_job(version):
+    with database.get_connection() as conn:
+        conn.execute(
+            "UPDATE rescoring_jobs SET finished_at = CURRENT_TIMESTAMP WHERE recommendation_version = ?",
+            (version,)
+        )
+    database.get_stats_cache().invalidate()
+
+def rescore(workers=None, chunk_size=CHUNK_SIZE, k=3, version=None):
+    # Workers load the catalog themselves and stop if it no longer matches
+    # the one the job started with
+    catalog_version = scoring_version()
+    version = version or catalog_version
+    database.init_database()
+    job = start_job(version, chunk_size, k)
+    total = len(job['pending']) + job['done']
+    rescored = 0
+    
+    if job['pending']:
+        # Spawned workers start without the parent's open SQLite connections
+        context = multiprocessing.get_context('spawn')
+        tasks = [
+            (database.DATABASE_PATH, version, catalog_version, start, end, job['top_k'])
+            for start, end in job['pending']
+        ]
+        with context.Pool(workers or os.cpu_count()) as pool:
+            for start, end, assessment_ids, rows in pool.imap_unordered(_score_chunk_task, tasks):
+                write_chunk(version, start, assessment_ids, rows)
+                rescored += len(assessment_ids)
+                job['done'] += 1
+                print(f"chunk {job['done']}/{total}: ids {start}-{end}, {len(assessment_ids)} re-scored", file=sys.stderr)
+    
+    finish_job(version)
+    return {'version': version, 'chunks': total, 'rescored': rescored, 'resumed': total - len(job['pending'])}
+
+def _score_chunk_task(task):
+    return score_chunk(*task)
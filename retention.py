@@ -0,0 +1,229 @@
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import database
+
+
+# Data retention for the SQLite file. Assessments older than the retention
+# age move, together with their recommendations, ratings and replaced
+# recommendations, into gzip-compressed JSON lines files with one record
+# per assessment. Their counts stay in the dashboard and trends through
+# the archived_* rollup tables. The job also moves explanation texts that
+# rows written before migration 9 still hold into the explanations table.
+RETENTION_DAYS = 365
+ARCHIVE_DIRECTORY = 'archive'
+# Each chunk is archived in one write transaction (about 0.1s for 500
+# assessments), and both jobs pause between transactions so the app's
+# writers get the lock in between
+ARCHIVE_CHUNK_SIZE = 500
+EXPLANATION_CHUNK_SIZE = 5000
+STEP_PAUSE = 0.1
+
+# Incremental vacuum moves this many free pages per write transaction
+VACUUM_STEP_PAGES = 2000
+AUTO_VACUUM_INCREMENTAL = 2
+
+ARCHIVE_CONDITION = "a.id IN (SELECT id FROM temp.archive_ids)"
+
+def fetch_rows(conn, query):
+    cursor = conn.execute(query)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+def archive_records(conn):
+    # One record per assessment in temp.archive_ids, explanations as text
+    records = {}
+    for assessment in fetch_rows(conn, f"SELECT a.* FROM assessments a WHERE {ARCHIVE_CONDITION} ORDER BY a.id"):
+        records[assessment['id']] = {
+            'assessment': assessment,
+            'recommendations': [],
+            'feedback': [],
+            'recommendation_history': []
+        }
+    
+    for table in ('recommendations', 'recommendation_history'):
+        for row in fetch_rows(conn, f'''
+            SELECT r.id, r.assessment_id, r.course_name, r.confidence_score,
+                   COALESCE(r.explanation, e.text) AS explanation, r.recommendation_version
+                   {', r.replaced_by, r.replaced_at' if table == 'recommendation_history' else ''}
+            FROM {table} r
+            JOIN assessments a ON a.id = r.assessment_id
+            LEFT JOIN explanations e ON e.id = r.explanation_id
+            WHERE {ARCHIVE_CONDITION}
+            ORDER BY r.id
+        '''):
+            records[row['assessment_id']][table].append(row)
+    
+    for row in fetch_rows(conn, f'''
+        SELECT f.* FROM feedback f
+        JOIN assessments a ON a.id = f.assessment_id
+        WHERE {ARCHIVE_CONDITION}
+        ORDER BY f.id
+    '''):
+        records[row['assessment_id']]['feedback'].append(row)
+    return list(records.values())
+
+def write_archive(path, records):
+    # Written in full and synced before the rows are deleted
+    staging_path = path + '.tmp'
+    with gzip.open(staging_path, 'wt', compresslevel=6, encoding='utf-8') as archive_file:
+        for record in records:
+            archive_file.write(json.dumps(record) + '\n')
+    with open(staging_path, 'rb') as archive_file:
+        os.fsync(archive_file.fileno())
+    os.replace(staging_path, path)
+
+def archive_chunk(conn, cutoff, directory, chunk_size):
+    # Archives the oldest chunk of assessments before cutoff; returns the
+    # number archived
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_ids (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM archive_ids")
+    conn.execute('''
+        INSERT INTO archive_ids (id)
+        SELECT id FROM assessments WHERE timestamp < ? ORDER BY timestamp, id LIMIT ?
+    ''', (cutoff, chunk_size))
+    first_id, last_id, count = conn.execute("SELECT MIN(id), MAX(id), COUNT(*) FROM archive_ids").fetchone()
+    if not count:
+        return 0
+    
+    path = os.path.join(directory, f"assessments-{first_id}-{last_id}.jsonl.gz")
+    write_archive(path, archive_records(conn))
+    
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_activity AS SELECT * FROM archived_daily_activity WHERE 0")
+    conn.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS archive_courses AS SELECT * FROM archived_daily_course_recommendations WHERE 0"
+    )
+    conn.execute("DELETE FROM archive_activity")
+    conn.execute("DELETE FROM archive_courses")
+    database.compute_trend_rollups(conn, 'temp.archive_activity', 'temp.archive_courses', ARCHIVE_CONDITION)
+    database.merge_daily_activity(conn, 'temp.archive_activity', 'archived_daily_activity')
+    database.merge_daily_course_recommendations(conn, 'temp.archive_courses', 'archived_daily_course_recommendations')
+    
+    # The recommendations delete trigger takes the rows out of the live
+    # course counts; they are added back since archived rows still count
+    conn.execute("DELETE FROM recommendations WHERE assessment_id IN (SELECT id FROM temp.archive_ids)")
+    database.merge_daily_course_recommendations(conn, 'temp.archive_courses', 'daily_course_recommendations')
+    database.merge_course_counts(conn, 'temp.archive_courses')
+    for table in ('recommendation_history', 'feedback'):
+        conn.execute(f"DELETE FROM {table} WHERE assessment_id IN (SELECT id FROM temp.archive_ids)")
+    conn.execute("DELETE FROM assessments WHERE id IN (SELECT id FROM temp.archive_ids)")
+    
+    conn.execute('''
+        INSERT OR REPLACE INTO archive_files (path, first_id, last_id, assessments)
+        VALUES (?, ?, ?, ?)
+    ''', (path, first_id, last_id, count))
+    return count
+
+def move_explanations_chunk(conn, table, after_id, chunk_size):
+    # Points the next chunk of rows that still hold their text at the
+    # explanations table; returns the last id and the number of rows moved,
+    # None when none are left
+    ids = [row_id for row_id, in conn.execute(f'''
+        SELECT id FROM {table} WHERE id > ? AND explanation IS NOT NULL ORDER BY id LIMIT ?
+    ''', (after_id, chunk_size))]
+    if not ids:
+        return None
+    
+    condition = "id BETWEEN ? AND ? AND explanation IS NOT NULL"
+    conn.execute(f"INSERT OR IGNORE INTO explanations (text) SELECT DISTINCT explanation FROM {table} WHERE {condition}",
+                 (ids[0], ids[-1]))
+    moved = conn.execute(f'''
+        UPDATE {table}
+        SET explanation_id = (SELECT id FROM explanations WHERE text = explanation), explanation = NULL
+        WHERE {condition}
+    ''', (ids[0], ids[-1])).rowcount
+    return ids[-1], moved
+
+def move_explanations(chunk_size=EXPLANATION_CHUNK_SIZE):
+    # Returns the number of rows moved
+    moved = 0
+    for table in ('recommendations', 'recommendation_history'):
+        after_id = 0
+        while True:
+            with database.get_connection(immediate=True) as conn:
+                chunk = move_explanations_chunk(conn, table, after_id, chunk_size)
+            if chunk is None:
+                break
+            after_id, count = chunk
+            moved += count
+            time.sleep(STEP_PAUSE)
+    return moved
+
+def archive(older_than_days=RETENTION_DAYS, directory=ARCHIVE_DIRECTORY, chunk_size=ARCHIVE_CHUNK_SIZE):
+    # A file in the directory that is missing from archive_files is left
+    # over from an interrupted run; its rows are still in the database.
+    database.init_database()
+    os.makedirs(directory, exist_ok=True)
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).strftime('%Y-%m-%d %H:%M:%S')
+    
+    archived = files = 0
+    while True:
+        with database.get_connection(immediate=True) as conn:
+            count = archive_chunk(conn, cutoff, directory, chunk_size)
+        if not count:
+            break
+        archived += count
+        files += 1
+        time.sleep(STEP_PAUSE)
+    
+    database.get_stats_cache().invalidate()
+    return {
+        'cutoff': cutoff,
+        'archived': archived,
+        'files': files,
+        'directory': directory,
+        'explanations_moved': move_explanations()
+    }
+
+def file_size(path):
+    return sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix))
+
+def compact(full=False, step_pages=VACUUM_STEP_PAGES):
+    # Returns free pages to the file system a step at a time, so writers
+    # wait for one short transaction instead of a full VACUUM. A file made
+    # before incremental vacuum was enabled needs one full VACUUM first.
+    database.init_database()
+    path = database.DATABASE_PATH
+    size_before = file_size(path)
+    started = time.perf_counter()
+    
+    # Autocommit statements on one borrowed connection; VACUUM and the
+    # checkpoint cannot run inside a transaction
+    pool = database.get_connection_pool()
+    conn = pool.acquire()
+    try:
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if mode != AUTO_VACUUM_INCREMENTAL:
+            if not full:
+                raise ValueError("incremental vacuum is not enabled for this database; run compact --full once")
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        
+        freed = 0
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        while free_pages:
+            # execute() would step the pragma once, which frees a single
+            # page; executescript runs it to the end as one write transaction
+            conn.executescript(f"PRAGMA incremental_vacuum({step_pages})")
+            remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if remaining >= free_pages:
+                break
+            freed += free_pages - remaining
+            free_pages = remaining
+            time.sleep(STEP_PAUSE)
+        
+        # Moves the vacuumed pages into the database file and empties the WAL
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    finally:
+        pool.release(conn)
+    
+    return {
+        'freed_pages': freed,
+        'full_vacuum': mode != AUTO_VACUUM_INCREMENTAL,
+        'bytes_before': size_before,
+        'bytes_after': file_size(path),
+        'seconds': round(time.perf_counter() - started, 3)
+    }
@@ -0,0 +1,124 @@
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import recommender
+
+
+# Tables as the original single-file app created them, before migrations
+BASELINE_SCHEMA = '''
+    CREATE TABLE assessments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        school TEXT,
+        strand TEXT,
+        tvl_strand TEXT,
+        science_interest INTEGER,
+        arts_interest INTEGER,
+        teaching_interest INTEGER,
+        business_interest INTEGER,
+        technology_interest INTEGER,
+        design_interest INTEGER,
+        sports_interest INTEGER,
+        logical_ability INTEGER,
+        creativity_ability INTEGER,
+        communication_ability INTEGER,
+        practical_ability INTEGER,
+        teamwork_ability INTEGER,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE recommendations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        assessment_id INTEGER,
+        course_name TEXT,
+        confidence_score REAL,
+        explanation TEXT,
+        FOREIGN KEY (assessment_id) REFERENCES assessments (id)
+    );
+    CREATE TABLE feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        assessment_id INTEGER,
+        course_name TEXT,
+        rating INTEGER,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (assessment_id) REFERENCES assessments (id)
+    );
+'''
+
+@pytest.fixture(autouse=True)
+def restore_database(monkeypatch):
+    # Tests and the CLI switch the process-wide database; put it back after.
+    # Each test starts with an empty stats cache.
+    monkeypatch.setattr(database, 'DATABASE_PATH', database.DATABASE_PATH)
+    monkeypatch.setattr(database, '_storage', database._storage)
+    monkeypatch.setattr(database, '_stats_cache', database.StatsCache())
+
+@pytest.fixture
+def sqlite_database(tmp_path):
+    # A fresh SQLite file as the process-wide database
+    path = str(tmp_path / 'test.db')
+    database.set_database_path(path)
+    database.init_database()
+    yield path
+    database.get_connection_pool(path).close()
+
+@pytest.fixture
+def baseline_database(tmp_path):
+    # A file written by the original app: two assessments, their
+    # recommendations and one rating
+    path = str(tmp_path / 'baseline.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    for assessment_id, day in ((1, '2024-01-05 10:00:00'), (2, '2024-02-10 11:00:00')):
+        conn.execute(
+            "INSERT INTO assessments VALUES (?, 'Old', 'Old School', 'STEM', 'Not applicable', "
+            "4, 2, 3, 1, 5, 2, 1, 5, 3, 3, 4, 2, ?)", (assessment_id, day)
+        )
+        for course, score in (('Computer Science', 4.6), ('Data Science', 4.4), ('Information Technology', 4.3)):
+            conn.execute(
+                "INSERT INTO recommendations (assessment_id, course_name, confidence_score, explanation) "
+                "VALUES (?, ?, ?, 'Old explanation.')", (assessment_id, course, score)
+            )
+    conn.execute("INSERT INTO feedback (assessment_id, course_name, rating) VALUES (1, 'Computer Science', 4)")
+    conn.commit()
+    conn.close()
+    yield path
+    database.get_connection_pool(path).close()
+
+@pytest.fixture
+def dbapi_storage(tmp_path, monkeypatch):
+    # The DB-API backend over a SQLite file, run from a directory where a
+    # stray default database file would show up
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'dbapi.db')
+    storage = database.DBAPIStorage(lambda: sqlite3.connect(path, check_same_thread=False))
+    database.set_storage(storage)
+    yield storage
+    storage.close()
+
+@pytest.fixture
+def use_catalog(tmp_path, monkeypatch):
+    # Serves a catalog written to a temporary file, with the weight artifact
+    # next to it; the shipped ones are back after the test
+    shipped_path = recommender.CATALOG_PATH
+    for name in ('_catalog', '_catalog_files', '_catalog_checked_at', '_catalog_reloading'):
+        monkeypatch.setattr(recommender, name, getattr(recommender, name))
+    monkeypatch.setattr(recommender, 'CATALOG_PATH', str(tmp_path / 'courses.json'))
+    monkeypatch.setattr(recommender, 'WEIGHTS_PATH', str(tmp_path / 'course_weights.json'))
+    
+    def use(data=None):
+        if data is None:
+            with open(shipped_path) as catalog_file:
+                data = json.load(catalog_file)
+        with open(recommender.CATALOG_PATH, 'w') as catalog_file:
+            json.dump(data, catalog_file)
+        return recommender.reload_catalog()
+    
+    yield use
+    recommender.cached_rank_courses.cache_clear()
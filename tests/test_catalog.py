@@ -0,0 +1,178 @@
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import recommender
+from recommender import FEATURES, generate_explanation, get_batch_recommendations, get_catalog
+
+
+SHIPPED_CATALOG = recommender.CATALOG_PATH
+
+def shipped_catalog():
+    with open(SHIPPED_CATALOG) as catalog_file:
+        return json.load(catalog_file)
+
+def test_wide_templates_are_formatted_without_a_table(use_catalog):
+    data = shipped_catalog()
+    wide = ' '.join('{%s}' % feature for feature in FEATURES[:recommender.MAX_PRERENDERED_FIELDS + 2])
+    data['courses'][0]['explanation'] = wide
+    catalog = use_catalog(data)
+    # Each course's table has 5^fields entries, so the shipped two-field
+    # templates stay small; the wide one has no table
+    assert catalog.explanation_offsets[0] == -1
+    assert len(catalog.explanation_table) < 5 ** recommender.MAX_PRERENDERED_FIELDS
+    
+    answers = np.random.default_rng(0).integers(1, 6, size=(500, len(FEATURES)))
+    results = get_batch_recommendations(answers)
+    for row, (courses, explanations) in enumerate(zip(results['courses'], results['explanations'])):
+        values = answers[row].tolist()
+        assert list(explanations) == [generate_explanation(course, values, catalog) for course in courses]
+    assert generate_explanation(catalog.names[0], list(range(1, 13)), catalog) == '1 2 3 4 5 6'
+
+def test_changed_catalog_is_rebuilt_in_the_background(use_catalog, monkeypatch):
+    data = shipped_catalog()
+    first = use_catalog(data)
+    
+    release = threading.Event()
+    build_catalog = recommender.build_catalog
+    
+    def slow_build():
+        release.wait(5)
+        return build_catalog()
+    
+    monkeypatch.setattr(recommender, 'build_catalog', slow_build)
+    data['courses'][0]['weights'] = {'science_interest': 1.0}
+    with open(recommender.CATALOG_PATH, 'w') as catalog_file:
+        json.dump(data, catalog_file)
+    monkeypatch.setattr(recommender, '_catalog_checked_at', 0.0)
+    
+    # Requests keep the running catalog while one thread builds the new one
+    assert get_catalog() is first
+    monkeypatch.setattr(recommender, '_catalog_checked_at', 0.0)
+    assert get_catalog() is first
+    assert [thread.name for thread in threading.enumerate()].count('catalog-reload') == 1
+    
+    release.set()
+    for thread in threading.enumerate():
+        if thread.name == 'catalog-reload':
+            thread.join(5)
+    assert get_catalog() is not first
+    assert get_catalog().version != first.version
+
+# Courses open to part of the strands: 'TVL' admits every TVL track, and
+# Open Studies (no 'strands') admits everyone
+RESTRICTED_CATALOG = {
+    'strands': ['STEM', 'ABM', 'HUMMS', 'TVL-ICT', 'TVL-HE'],
+    'courses': [
+        {'name': 'Physics', 'strands': ['STEM'],
+         'weights': {'science_interest': 0.6, 'logical_ability': 0.4}},
+        {'name': 'Software Engineering', 'strands': ['STEM', 'TVL-ICT'],
+         'weights': {'technology_interest': 0.5, 'logical_ability': 0.5},
+         'explanation': "Technology {technology_interest}/5, logic {logical_ability}/5."},
+        {'name': 'Accountancy', 'strands': ['ABM'],
+         'weights': {'business_interest': 0.7, 'logical_ability': 0.3}},
+        {'name': 'Technical Teaching', 'strands': ['TVL'],
+         'weights': {'teaching_interest': 0.5, 'practical_ability': 0.5}},
+        {'name': 'Open Studies',
+         'weights': {'arts_interest': 0.3, 'communication_ability': 0.3, 'teamwork_ability': 0.3}},
+        {'name': 'Marketing', 'strands': ['ABM', 'HUMMS'],
+         'weights': {'business_interest': 0.4, 'communication_ability': 0.6}},
+        {'name': 'Social Work', 'strands': ['HUMMS'],
+         'weights': {'teaching_interest': 0.4, 'teamwork_ability': 0.6}},
+        {'name': 'Culinary Arts', 'strands': ['TVL-HE'],
+         'weights': {'design_interest': 0.5, 'practical_ability': 0.5}}
+    ]
+}
+
+ADMITTED = {
+    'STEM': {'Physics', 'Software Engineering', 'Open Studies'},
+    'ABM': {'Accountancy', 'Open Studies', 'Marketing'},
+    'HUMMS': {'Open Studies', 'Marketing', 'Social Work'},
+    'TVL-ICT': {'Software Engineering', 'Technical Teaching', 'Open Studies'},
+    'TVL-HE': {'Technical Teaching', 'Open Studies', 'Culinary Arts'}
+}
+ADMITTED['TVL'] = ADMITTED['TVL-ICT'] | ADMITTED['TVL-HE']
+
+def test_strand_candidates():
+    candidates = recommender.strand_candidates(RESTRICTED_CATALOG['strands'], RESTRICTED_CATALOG['courses'])
+    names = [course['name'] for course in RESTRICTED_CATALOG['courses']]
+    assert {strand: {names[row] for row in rows} for strand, rows in candidates.items()} == ADMITTED
+    assert all(list(rows) == sorted(rows) for rows in candidates.values())
+    
+    with pytest.raises(ValueError, match='unknown strands GAS'):
+        recommender.strand_candidates(['STEM'], [{'name': 'History', 'strands': ['GAS']}])
+    with pytest.raises(ValueError, match='no course admits ABM'):
+        recommender.strand_candidates(['STEM', 'ABM'], [{'name': 'Physics', 'strands': ['STEM']}])
+
+def test_strand_keys_and_scopes(use_catalog):
+    catalog = use_catalog(RESTRICTED_CATALOG)
+    assert catalog.restricted
+    
+    tvl = 'TVL (Technical-Vocational-Livelihood)'
+    assert recommender.strand_key(tvl, 'ICT (Information and Communications Technology)') == 'TVL-ICT'
+    assert recommender.strand_key(tvl, 'Not applicable') == 'TVL'
+    assert recommender.strand_key('ABM (Accountancy, Business, & Management)', 'HE (Home Economics)') == 'ABM'
+    assert recommender.strand_key('', 'Not applicable') is None
+    
+    assert catalog.scope_key('TVL-HE') == 'TVL-HE'
+    # A track the catalog does not list falls back to its group
+    assert catalog.scope_key('TVL-AFA') == 'TVL'
+    assert catalog.scope_key('GAS') is None
+    assert catalog.scope_key(None) is None
+    
+    for strand, admitted in ADMITTED.items():
+        rows, weights, bias = catalog.scope(strand)
+        assert {catalog.names[row] for row in rows} == admitted
+        assert weights.shape[1] == len(rows) and len(bias) == len(rows)
+    assert len(catalog.scope(None)[0]) == len(catalog.names)
+    
+    # Batch scoring groups rows by scope, unknown strands with the full catalog
+    groups = recommender.scope_rows(catalog, ['STEM', 'TVL-AFA', 'GAS', None, 'STEM'], 5)
+    assert {scope: rows.tolist() for scope, rows in groups.items()} == {'STEM': [0, 4], 'TVL': [1], None: [2, 3]}
+
+def test_restricted_single_and_batch_scoring_agree(use_catalog):
+    catalog = use_catalog(RESTRICTED_CATALOG)
+    strand_labels = [
+        ('STEM', 'Not applicable'), ('ABM (Accountancy, Business, & Management)', 'Not applicable'),
+        ('HUMMS (Humanities & Social Sciences)', 'Not applicable'),
+        ('GAS (General Academic Strand)', 'Not applicable'),
+        ('TVL (Technical-Vocational-Livelihood)', 'ICT (Information and Communications Technology)'),
+        ('TVL (Technical-Vocational-Livelihood)', 'HE (Home Economics)'),
+        ('TVL (Technical-Vocational-Livelihood)', 'AFA (Agri-Fishery Arts)'),
+        ('TVL (Technical-Vocational-Livelihood)', 'Not applicable')
+    ]
+    rng = np.random.default_rng(2)
+    rows = []
+    for n in range(800):
+        strand, tvl_strand = strand_labels[n % len(strand_labels)]
+        row = {'strand': strand, 'tvl_strand': tvl_strand}
+        row.update(zip(FEATURES, rng.integers(1, 6, size=len(FEATURES)).tolist()))
+        rows.append(row)
+    
+    results = get_batch_recommendations(pd.DataFrame(rows))
+    for row, data in enumerate(rows):
+        recommendations = recommender.get_recommendations(data)
+        courses = [rec['course'] for rec in recommendations]
+        assert list(results['courses'][row]) == courses
+        assert list(results['explanations'][row]) == [rec['explanation'] for rec in recommendations]
+        assert list(results['scores'][row]) == pytest.approx([rec['score'] for rec in recommendations])
+        
+        scope = catalog.scope_key(recommender.strand_key(data['strand'], data['tvl_strand']))
+        admitted = ADMITTED[scope] if scope else set(catalog.names)
+        assert set(courses) <= admitted
+
+def test_course_indices_match_whole_names():
+    catalog = get_catalog()
+    names = [
+        'Business Administration - Evening Program', 'Nursing', 'Business', '', 'Business Administration',
+        catalog.names[0] + ' ' * 200
+    ]
+    assert recommender.course_indices(names).tolist() == [
+        -1, catalog.index['Nursing'], -1, -1, catalog.index['Business Administration'], -1
+    ]
+    chunk = np.array(names, dtype='U128')
+    assert recommender.course_indices(chunk, catalog).tolist() == recommender.course_indices(names).tolist()
+    assert recommender.course_indices([]).tolist() == []
@@ -0,0 +1,57 @@
+import csv
+
+import pytest
+
+import cli
+import database
+from recommender import FEATURES
+
+
+def test_export_migrates_baseline_database(baseline_database, tmp_path):
+    output = tmp_path / 'export.csv'
+    cli.main(['--db', baseline_database, 'export', str(output)])
+    with open(output, newline='') as export_file:
+        rows = list(csv.DictReader(export_file))
+    assert len(rows) == 6
+    assert {row['explanation'] for row in rows} == {'Old explanation.'}
+
+def test_export_needs_an_existing_database(tmp_path):
+    missing = tmp_path / 'typo.db'
+    with pytest.raises(SystemExit):
+        cli.main(['--db', str(missing), 'export', str(tmp_path / 'export.csv')])
+    assert not missing.exists()
+
+def write_assessments(path, n=4):
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['strand'] + FEATURES)
+        for row in range(n):
+            writer.writerow(['STEM'] + [row % 5 + 1] * len(FEATURES))
+
+def test_commands_use_the_configured_storage(dbapi_storage, tmp_path):
+    # Without --db the commands use the app's storage (DATABASE_URL), not
+    # a local course_recommendation.db
+    write_assessments(tmp_path / 'assessments.csv')
+    cli.main(['import', str(tmp_path / 'assessments.csv')])
+    assert database.load_dashboard_stats()['total_assessments'] == 4
+    cli.main(['train', '--output', str(tmp_path / 'weights.json')])
+    assert not (tmp_path / database.DATABASE_PATH).exists()
+    
+    with pytest.raises(SystemExit):
+        cli.main(['rescore'])
+
+def test_sqlite_database_url_is_followed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'configured.db'}")
+    monkeypatch.setattr(database, '_storage', None)
+    # A fresh file: train creates the tables first
+    cli.main(['train', '--output', str(tmp_path / 'weights.json')])
+    write_assessments(tmp_path / 'assessments.csv')
+    cli.main(['import', str(tmp_path / 'assessments.csv')])
+    cli.main(['precompute', '--limit', '10'])
+    
+    assert database.DATABASE_PATH == str(tmp_path / 'configured.db')
+    with database.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM profile_recommendations").fetchone()[0] == 12
+    assert not (tmp_path / 'course_recommendation.db').exists()
+    database.get_connection_pool().close()
@@ -0,0 +1,152 @@
+import numpy as np
+
+import database
+import rescoring
+import retention
+from recommender import FEATURES, get_recommendations, pack_answer_matrix, pack_answers, unpack_answer_matrix
+
+
+def summaries():
+    return database.load_dashboard_stats(), [database.load_trends(period) for period in database.TREND_PERIODS]
+
+def totals(summary):
+    # Re-scoring may change which courses the old assessments got, so jobs
+    # that rewrite recommendations are checked against these numbers only
+    stats, trends = summary
+    return stats['total_assessments'], stats['agreement_rate'], [
+        (trend['periods'], trend['assessments'], trend['ratings']) for trend in trends
+    ]
+
+def save_new_assessments():
+    # Five assessments scored with the current version, each with a rating
+    for value in range(1, 6):
+        data = {'name': 'New', 'school': 'New School', 'strand': 'ABM', 'tvl_strand': 'Not applicable'}
+        data.update({feature: value for feature in FEATURES})
+        recommendations, version = get_recommendations(data, with_version=True)
+        assessment_id = database.save_assessment_results(data, recommendations, version)
+        database.save_feedback(assessment_id, recommendations[0]['course'], value)
+
+def test_migrate_baseline_database(baseline_database):
+    database.set_database_path(baseline_database)
+    database.init_database()
+    # A second start finds the schema current
+    database.init_database()
+    
+    with database.get_connection() as conn:
+        assert database.get_schema_version(conn) == database.SCHEMA_VERSION
+        recommendations = conn.execute('''
+            SELECT r.assessment_id, r.course_name, COALESCE(r.explanation, e.text), r.recommendation_version
+            FROM recommendations r
+            LEFT JOIN explanations e ON e.id = r.explanation_id
+            ORDER BY r.id
+        ''').fetchall()
+        ratings = conn.execute("SELECT assessment_id, course_name, rating FROM feedback").fetchall()
+    assert len(recommendations) == 6
+    assert {row[2:] for row in recommendations} == {('Old explanation.', None)}
+    assert ratings == [(1, 'Computer Science', 4)]
+    
+    stats, (_, _, months) = summaries()
+    assert stats['total_assessments'] == 2
+    assert stats['agreement_rate'] == 80.0
+    assert {course['course_name']: course['count'] for course in stats['popular_courses']}['Computer Science'] == 2
+    # Ratings count on the day they were given, here the day the fixture ran
+    assert months['periods'][:2] == ['2024-01-01', '2024-02-01']
+    assert months['assessments'][:2] == [1, 1] and sum(months['assessments']) == 2
+    assert sum(months['ratings']) == 1
+
+def test_rebuild_matches_the_trigger_maintained_rollups(baseline_database):
+    database.set_database_path(baseline_database)
+    database.init_database()
+    save_new_assessments()
+    before = summaries()
+    assert sum(before[1][0]['assessments']) == 7 and sum(before[1][0]['ratings']) == 6
+    
+    database.rebuild_dashboard_summary()
+    assert summaries() == before
+
+def test_rescore_keeps_totals(baseline_database):
+    database.set_database_path(baseline_database)
+    database.init_database()
+    save_new_assessments()
+    before = summaries()
+    
+    # Only the two baseline assessments have an older version
+    assert rescoring.rescore(workers=1)['rescored'] == 2
+    after = summaries()
+    assert totals(after) == totals(before)
+    database.rebuild_dashboard_summary()
+    assert summaries() == after
+
+def test_archive_keeps_totals(baseline_database, tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, 'STEP_PAUSE', 0)
+    database.set_database_path(baseline_database)
+    database.init_database()
+    save_new_assessments()
+    before = summaries()
+    
+    # The two baseline assessments are older than the retention period
+    archived = retention.archive(directory=str(tmp_path / 'archive'), chunk_size=1)
+    assert (archived['archived'], archived['files']) == (2, 2)
+    with database.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM assessments").fetchone()[0] == 5
+    after = summaries()
+    assert totals(after) == totals(before)
+    database.rebuild_dashboard_summary()
+    assert summaries() == after
+
+def test_explanations_move_to_their_table_in_chunks(baseline_database, monkeypatch):
+    monkeypatch.setattr(retention, 'STEP_PAUSE', 0)
+    database.set_database_path(baseline_database)
+    database.init_database()
+    save_new_assessments()
+    query = '''
+        SELECT r.id, COALESCE(r.explanation, e.text), r.explanation IS NULL, r.explanation_id IS NULL
+        FROM recommendations r
+        LEFT JOIN explanations e ON e.id = r.explanation_id
+        ORDER BY r.id
+    '''
+    with database.get_connection() as conn:
+        before = conn.execute(query).fetchall()
+    # The migration leaves the baseline rows' text in place
+    assert [row[2:] for row in before] == [(0, 1)] * 6 + [(1, 0)] * 15
+    
+    assert retention.move_explanations(chunk_size=4) == 6
+    with database.get_connection() as conn:
+        after = conn.execute(query).fetchall()
+    assert [row[:2] for row in after] == [row[:2] for row in before]
+    assert {row[2:] for row in after} == {(1, 0)}
+    assert retention.move_explanations() == 0
+
+def test_answer_codes_round_trip_through_the_database(baseline_database):
+    # The baseline rows are packed by the migration, the new ones on insert
+    database.set_database_path(baseline_database)
+    database.init_database()
+    baseline = [4, 2, 3, 1, 5, 2, 1, 5, 3, 3, 4, 2]
+    answers = np.vstack([
+        np.ones(len(FEATURES), dtype=int), np.full(len(FEATURES), 5), np.tile([1, 5], len(FEATURES) // 2),
+        np.arange(len(FEATURES)) % 5 + 1, np.random.default_rng(0).integers(1, 6, size=(50, len(FEATURES)))
+    ])
+    codes = pack_answer_matrix(answers)
+    assert codes.tolist() == [pack_answers(row) for row in answers]
+    # All 1s and all 5s are the smallest and largest codes
+    assert (codes.min(), codes.max()) == (codes[0], codes[1]) and len(set(codes.tolist())) == len(answers)
+    assert np.array_equal(unpack_answer_matrix(codes), answers)
+    
+    # Answers outside 1-5 have no code and are read from their columns
+    unpackable = np.full(len(FEATURES), 3)
+    unpackable[[0, -1]] = [0, 7]
+    for row in np.vstack([answers, unpackable]).tolist():
+        data = {'name': 'Packed', 'school': 'Test School', 'strand': 'STEM', 'tvl_strand': 'Not applicable'}
+        data.update(zip(FEATURES, row))
+        database.save_assessment_results(data, [], 'test')
+    
+    ids, loaded = database.load_answer_matrix()
+    assert ids.tolist() == list(range(1, len(answers) + 4))
+    assert loaded.dtype == np.uint8
+    assert np.array_equal(loaded, np.vstack([baseline, baseline, answers, unpackable]))
+    with database.get_connection() as conn:
+        stored = [code for code, in conn.execute("SELECT answer_code FROM assessments ORDER BY id")]
+    assert stored == pack_answer_matrix([baseline, baseline]).tolist() + codes.tolist() + [None]
+    
+    ids, loaded = database.load_answer_matrix("WHERE id BETWEEN ? AND ?", (3, 4))
+    assert ids.tolist() == [3, 4] and np.array_equal(loaded, answers[:2])
@@ -0,0 +1,125 @@
+import sqlite3
+import time
+
+import pytest
+
+import database
+from feedback_writer import FeedbackWriter
+from recommender import FEATURES, get_recommendations
+
+
+@pytest.fixture
+def assessment_id(sqlite_database):
+    data = {'name': 'Test', 'school': 'Test School', 'strand': 'STEM', 'tvl_strand': 'Not applicable'}
+    data.update({feature: 3 for feature in FEATURES})
+    return database.save_assessment_results(data, *get_recommendations(data, with_version=True))
+
+@pytest.fixture
+def batches():
+    # Records each batch before writing it to the test database
+    written = []
+    
+    def write(batch):
+        written.append(batch)
+        database.save_feedback_batch(batch)
+    
+    write.batches = written
+    return write
+
+def stored_ratings():
+    with database.get_connection() as conn:
+        return dict(conn.execute("SELECT course_name, rating FROM feedback").fetchall())
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_repeated_ratings_collapse_into_one_upsert(assessment_id, batches):
+    writer = FeedbackWriter(flush_interval=60, write=batches)
+    for course, rating in [('Nursing', 3), ('Nursing', 5), ('Education', 2), ('Nursing', 4)]:
+        writer.submit(assessment_id, course, rating)
+    assert writer.pending() == 2
+    
+    assert writer.flush() == 2
+    # The latest click wins and goes behind the ratings given before it
+    assert batches.batches == [[(assessment_id, 'Education', 2), (assessment_id, 'Nursing', 4)]]
+    assert stored_ratings() == {'Education': 2, 'Nursing': 4}
+    
+    writer.submit(assessment_id, 'Nursing', 1)
+    writer.close()
+    assert stored_ratings() == {'Education': 2, 'Nursing': 1}
+    assert writer.written == 3
+
+def test_full_batch_is_written_without_waiting_for_the_timer(assessment_id, batches):
+    writer = FeedbackWriter(flush_interval=60, flush_size=3, write=batches)
+    writer.submit(assessment_id, 'Nursing', 5)
+    writer.submit(assessment_id, 'Education', 4)
+    time.sleep(0.1)
+    assert writer.written == 0
+    
+    writer.submit(assessment_id, 'Psychology', 3)
+    wait_for(lambda: writer.written == 3)
+    assert len(batches.batches) == 1
+    assert stored_ratings() == {'Nursing': 5, 'Education': 4, 'Psychology': 3}
+    writer.close()
+
+def test_timer_writes_a_partial_batch(assessment_id, batches):
+    writer = FeedbackWriter(flush_interval=0.05, flush_size=100, write=batches)
+    writer.submit(assessment_id, 'Nursing', 5)
+    wait_for(lambda: writer.written == 1)
+    assert stored_ratings() == {'Nursing': 5}
+    writer.close()
+
+def test_close_drains_pending_ratings(assessment_id, batches):
+    writer = FeedbackWriter(flush_interval=60, write=batches)
+    writer.submit(assessment_id, 'Nursing', 5)
+    writer.submit(assessment_id, 'Education', 4)
+    writer.close()
+    assert (writer.written, writer.pending()) == (2, 0)
+    assert stored_ratings() == {'Nursing': 5, 'Education': 4}
+    
+    writer.close()
+    with pytest.raises(RuntimeError, match='closed'):
+        writer.submit(assessment_id, 'Nursing', 1)
+
+def test_failed_batch_is_counted_and_kept(assessment_id, batches):
+    locked = [True]
+    
+    def write(batch):
+        if locked[0]:
+            raise sqlite3.OperationalError("database is locked")
+        batches(batch)
+    
+    writer = FeedbackWriter(flush_interval=60, write=write)
+    writer.submit(assessment_id, 'Nursing', 5)
+    writer.submit(assessment_id, 'Education', 4)
+    with pytest.raises(sqlite3.OperationalError):
+        writer.flush()
+    assert (writer.failures, writer.written, writer.pending()) == (1, 0, 2)
+    
+    # A newer click on a failed rating replaces it before the retry
+    writer.submit(assessment_id, 'Nursing', 2)
+    locked[0] = False
+    assert writer.flush() == 2
+    assert batches.batches == [[(assessment_id, 'Education', 4), (assessment_id, 'Nursing', 2)]]
+    assert stored_ratings() == {'Nursing': 2, 'Education': 4}
+    assert writer.failures == 1
+    writer.close()
+
+def test_background_failures_are_retried(assessment_id, batches):
+    failures = []
+    
+    def write(batch):
+        if len(failures) < 2:
+            failures.append(batch)
+            raise sqlite3.OperationalError("database is locked")
+        batches(batch)
+    
+    writer = FeedbackWriter(flush_interval=0.02, write=write)
+    writer.submit(assessment_id, 'Nursing', 5)
+    wait_for(lambda: writer.written == 1)
+    assert writer.failures == 2
+    assert stored_ratings() == {'Nursing': 5}
+    writer.close()
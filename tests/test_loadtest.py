@@ -0,0 +1,45 @@
+import sqlite3
+
+import pytest
+
+import feedback_writer
+import loadtest
+
+
+CONFIG = {
+    'sessions': 5, 'duration': 30.0, 'think_time': 0.0, 'write_path': 'results', 'feedback': 'writer',
+    'rating_probability': 1.0, 'uncached_dashboard': False, 'prefill': 0, 'seed': 0
+}
+
+@pytest.fixture
+def failing_writer(monkeypatch):
+    # Every batch write hits a locked database
+    def write(batch):
+        raise sqlite3.OperationalError("database is locked")
+    
+    writer = feedback_writer.FeedbackWriter(flush_interval=60, write=write)
+    monkeypatch.setattr(feedback_writer, '_writer', writer)
+    yield writer
+    writer.write = lambda batch: None
+    writer.close()
+
+def test_thread_run_counts_failed_writer_batches(tmp_path, failing_writer):
+    report = loadtest.run(str(tmp_path / 'load.db'), 2, CONFIG)
+    assert report['feedback_writer']['written'] == 0
+    assert report['feedback_writer']['failures'] >= 1
+    assert report['feedback_writer']['pending'] == 30
+    assert report['lock_errors'] == report['feedback_writer']['failures'] + 30
+
+def test_worker_process_reports_failed_close(tmp_path, failing_writer):
+    # What a worker process returns to run() after closing its own writer
+    path = str(tmp_path / 'load.db')
+    loadtest.database.set_database_path(path)
+    loadtest.database.init_database()
+    result = loadtest.run_sessions(0, CONFIG, path)
+    assert result['feedback_writer'] == {'written': 0, 'failures': 2, 'pending': 15}
+    assert result['latencies']['feedback'] and not result['errors']['feedback']
+
+def test_process_run_reports_writer_totals(tmp_path):
+    report = loadtest.run(str(tmp_path / 'load.db'), 2, dict(CONFIG, sessions=3), processes=True)
+    assert report['feedback_writer'] == {'written': 18, 'failures': 0, 'pending': 0}
+    assert report['lock_errors'] == 0
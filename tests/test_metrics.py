@@ -0,0 +1,89 @@
+import pytest
+
+import metrics
+from metrics import Histogram, MetricsRegistry, metrics_page_allowed
+
+
+def test_quantiles_interpolate_inside_buckets():
+    histogram = Histogram((1.0, 2.0, 4.0))
+    assert histogram.quantile(0.5) is None
+    for value in [1.0] * 2 + [1.5] * 6 + [3.0] * 2:
+        histogram.observe(value)
+    # A value on a bound counts in that bucket, as with Prometheus' le
+    assert histogram.counts == [2, 6, 2, 0]
+    assert histogram.quantile(0.1) == pytest.approx(0.5)
+    assert histogram.quantile(0.5) == pytest.approx(1.5)
+    assert histogram.quantile(0.95) == pytest.approx(3.5)
+    assert histogram.quantile(1.0) == pytest.approx(4.0)
+    
+    # Values past the last bound are only known to be above it
+    histogram.observe(100.0)
+    assert histogram.quantile(0.99) == 4.0
+    assert (histogram.count, histogram.sum) == (11, pytest.approx(117.0))
+
+def test_snapshot_and_timer_errors():
+    registry = MetricsRegistry((0.5, 1.0))
+    for seconds in (0.25, 0.75):
+        registry.observe('scoring_seconds', seconds, operation='rank')
+    with pytest.raises(ValueError):
+        with registry.timer('db_seconds', operation='save'):
+            raise ValueError("bad row")
+    
+    snapshot = registry.snapshot()
+    assert snapshot['counters'] == [
+        {'name': 'db_errors_total', 'labels': {'error': 'ValueError', 'operation': 'save'}, 'value': 1}
+    ]
+    db, scoring = snapshot['histograms']
+    assert (db['name'], db['count']) == ('db_seconds', 1)
+    assert scoring == {
+        'name': 'scoring_seconds', 'labels': {'operation': 'rank'}, 'count': 2, 'mean': 0.5,
+        'p50': pytest.approx(0.5), 'p95': pytest.approx(0.95), 'p99': pytest.approx(0.99)
+    }
+
+def test_prometheus_text():
+    registry = MetricsRegistry((0.1, 1.0))
+    registry.increment('requests_total', page='a"b\n')
+    registry.increment('requests_total', 2, page='x')
+    for seconds in (0.0625, 0.5, 3.0):
+        registry.observe('scoring_seconds', seconds, operation='rank')
+    assert registry.prometheus_text() == '\n'.join([
+        '# TYPE course_recommender_requests_total counter',
+        'course_recommender_requests_total{page="a\\"b\\n"} 1',
+        'course_recommender_requests_total{page="x"} 2',
+        '# TYPE course_recommender_scoring_seconds histogram',
+        'course_recommender_scoring_seconds_bucket{operation="rank",le="0.1"} 1',
+        'course_recommender_scoring_seconds_bucket{operation="rank",le="1.0"} 2',
+        'course_recommender_scoring_seconds_bucket{operation="rank",le="+Inf"} 3',
+        'course_recommender_scoring_seconds_sum{operation="rank"} 3.5625',
+        'course_recommender_scoring_seconds_count{operation="rank"} 3'
+    ]) + '\n'
+    
+    registry.reset()
+    assert registry.prometheus_text() == '\n'
+
+def test_metrics_page_needs_the_token():
+    token = 's3cret'
+    assert metrics_page_allowed({'page': ['metrics'], 'token': [token]}, token)
+    assert not metrics_page_allowed({'page': ['metrics'], 'token': ['wrong']}, token)
+    assert not metrics_page_allowed({'page': ['metrics']}, token)
+    assert not metrics_page_allowed({'page': ['dashboard'], 'token': [token]}, token)
+    # Without a configured token the page is off
+    assert not metrics_page_allowed({'page': ['metrics'], 'token': ['']}, None)
+    assert not metrics_page_allowed({'page': ['metrics'], 'token': ['']}, '')
+    
+    # Non-ASCII on either side is a mismatch or a match, never a TypeError
+    assert not metrics_page_allowed({'page': ['metrics'], 'token': ['sécret']}, token)
+    assert metrics_page_allowed({'page': ['metrics'], 'token': ['sécret']}, 'sécret')
+
+def test_timed_keeps_the_function(monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr(metrics, '_registry', registry)
+    
+    @metrics.timed('db_seconds')
+    def load(value):
+        return value * 2
+    
+    assert load.__name__ == 'load' and load(3) == 6
+    assert [(item['name'], item['labels'], item['count']) for item in registry.snapshot()['histograms']] == [
+        ('db_seconds', {'operation': 'load'}, 1)
+    ]
@@ -0,0 +1,61 @@
+import threading
+
+import numpy as np
+
+import neighbors
+from database import RATING_STATISTICS_ROW
+from recommender import ANSWER_VALUES, FEATURES, get_catalog, pack_answer_matrix
+
+
+def rating_statistics(n_rows, seed=0):
+    # Random (profile, course) rating sums, including repeated pairs
+    rng = np.random.default_rng(seed)
+    answers = rng.choice(ANSWER_VALUES, size=(n_rows // 4, len(FEATURES)))
+    chunk = np.zeros(n_rows, dtype=RATING_STATISTICS_ROW)
+    chunk['code'] = pack_answer_matrix(answers)[rng.integers(0, len(answers), n_rows)]
+    chunk['course'] = rng.choice(get_catalog().names, n_rows)
+    chunk['n'] = rng.integers(1, 4, n_rows)
+    chunk['sum'] = chunk['n'] * rng.integers(1, 6, n_rows)
+    return chunk
+
+def test_sparse_ratings_match_dense_sums():
+    chunk = rating_statistics(2000)
+    index = neighbors.NeighborIndex.from_statistics([chunk[:700], chunk[700:]])
+    catalog = index.catalog
+    
+    rows = np.searchsorted(index.codes, chunk['code'])
+    courses = np.array([catalog.names.index(course) for course in chunk['course']])
+    rating_sum = np.zeros((len(index), len(catalog.names)))
+    rating_count = np.zeros((len(index), len(catalog.names)))
+    np.add.at(rating_sum, (rows, courses), chunk['sum'])
+    np.add.at(rating_count, (rows, courses), chunk['n'])
+    assert len(index.courses) == len(set(zip(rows, courses)))
+    
+    rng = np.random.default_rng(1)
+    for values in rng.choice(ANSWER_VALUES, size=(20, len(FEATURES))):
+        nearest = index.nearest(values, 30)
+        sums, counts = index.neighbor_ratings(values, 30)
+        assert np.array_equal(sums, rating_sum[nearest].sum(axis=0))
+        assert np.array_equal(counts, rating_count[nearest].sum(axis=0))
+
+def test_stale_index_is_rebuilt_once_in_the_background():
+    release = threading.Event()
+    builds = []
+    
+    def build():
+        builds.append(threading.current_thread().name)
+        if len(builds) > 1:
+            release.wait(5)
+        return neighbors.NeighborIndex.from_statistics([rating_statistics(40, seed=len(builds))])
+    
+    cache = neighbors.NeighborIndexCache(build, ttl=0)
+    first = cache.get()
+    # Expired: every request keeps the old index while one rebuild runs
+    assert all(cache.get() is first for _ in range(5))
+    assert builds[1:] == ['neighbor-index']
+    
+    release.set()
+    for thread in threading.enumerate():
+        if thread.name == 'neighbor-index':
+            thread.join(5)
+    assert cache.get() is not first
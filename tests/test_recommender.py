@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from recommender import FEATURES, get_batch_recommendations, get_recommendations
+
+
+def original_recommendations(user_data):
+    # Top 3 of the hand-written formulas from the original app
+    interests = {
+        name: user_data[f'{name}_interest']
+        for name in ('science', 'arts', 'teaching', 'business', 'technology', 'design', 'sports')
+    }
+    abilities = {
+        name: user_data[f'{name}_ability']
+        for name in ('logical', 'creativity', 'communication', 'practical', 'teamwork')
+    }
+    course_scores = {
+        'Computer Science': interests['technology'] * 0.4 + interests['science'] * 0.3 + abilities['logical'] * 0.3,
+        'Information Technology': (
+            interests['technology'] * 0.5 + abilities['practical'] * 0.3 + abilities['logical'] * 0.2
+        ),
+        'Data Science': interests['science'] * 0.4 + interests['technology'] * 0.3 + abilities['logical'] * 0.3,
+        'Engineering': interests['science'] * 0.4 + abilities['logical'] * 0.3 + abilities['practical'] * 0.3,
+        'Business Administration': (
+            interests['business'] * 0.4 + abilities['communication'] * 0.3 + abilities['teamwork'] * 0.3
+        ),
+        'Psychology': interests['teaching'] * 0.3 + abilities['communication'] * 0.4 + abilities['teamwork'] * 0.3,
+        'Education': interests['teaching'] * 0.5 + abilities['communication'] * 0.3 + abilities['teamwork'] * 0.2,
+        'Nursing': interests['science'] * 0.3 + abilities['communication'] * 0.3 + abilities['teamwork'] * 0.4,
+        'Multimedia Arts': interests['arts'] * 0.4 + interests['design'] * 0.4 + abilities['creativity'] * 0.2,
+        'Hospitality Management': (
+            interests['business'] * 0.3 + abilities['communication'] * 0.4 + abilities['teamwork'] * 0.3
+        )
+    }
+    explanations = {
+        'Computer Science': f"Recommended because of your interest in technology ({interests['technology']}/5) and strong logical thinking abilities ({abilities['logical']}/5).",
+        'Information Technology': f"Great fit due to your technology interest ({interests['technology']}/5) and practical skills ({abilities['practical']}/5).",
+        'Data Science': f"Perfect match with your science interest ({interests['science']}/5) and logical abilities ({abilities['logical']}/5).",
+        'Engineering': f"Suits your science interest ({interests['science']}/5) and practical problem-solving skills ({abilities['practical']}/5).",
+        'Business Administration': f"Aligns with your business interest ({interests['business']}/5) and communication skills ({abilities['communication']}/5).",
+        'Psychology': f"Matches your interest in helping others and strong communication abilities ({abilities['communication']}/5).",
+        'Education': f"Perfect for your teaching interest ({interests['teaching']}/5) and communication skills ({abilities['communication']}/5).",
+        'Nursing': f"Great choice given your interest in helping others and teamwork abilities ({abilities['teamwork']}/5).",
+        'Multimedia Arts': f"Excellent match for your artistic interests ({interests['arts']}/5) and creativity ({abilities['creativity']}/5).",
+        'Hospitality Management': f"Suits your business interest ({interests['business']}/5) and people skills ({abilities['communication']}/5)."
+    }
+    top_3 = sorted(course_scores.items(), key=lambda x: x[1], reverse=True)[:3]
+    return [{'course': course, 'score': score, 'explanation': explanations[course]} for course, score in top_3]
+
+def random_assessments(n, seed=0):
+    rng = np.random.default_rng(seed)
+    answers = pd.DataFrame(rng.integers(1, 6, size=(n, len(FEATURES))), columns=FEATURES)
+    # Every answer the same gives the most ties between courses
+    answers.iloc[:5] = np.arange(1, 6)[:, None]
+    answers['strand'] = 'STEM'
+    answers['tvl_strand'] = 'Not applicable'
+    return answers
+
+def test_top_3_matches_original_formulas():
+    for data in random_assessments(3000).to_dict('records'):
+        expected = original_recommendations(data)
+        recommendations = get_recommendations(data)
+        assert [rec['course'] for rec in recommendations] == [rec['course'] for rec in expected]
+        assert [rec['explanation'] for rec in recommendations] == [rec['explanation'] for rec in expected]
+        assert [rec['score'] for rec in recommendations] == pytest.approx([rec['score'] for rec in expected])
+
+def test_batch_matches_single_scoring():
+    assessments = random_assessments(2000, seed=1)
+    results = get_batch_recommendations(assessments)
+    for row, data in enumerate(assessments.to_dict('records')):
+        recommendations = get_recommendations(data)
+        assert list(results['courses'][row]) == [rec['course'] for rec in recommendations]
+        assert list(results['explanations'][row]) == [rec['explanation'] for rec in recommendations]
+        assert list(results['scores'][row]) == pytest.approx([rec['score'] for rec in recommendations])
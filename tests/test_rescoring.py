@@ -0,0 +1,29 @@
+import database
+import neighbors
+import rescoring
+from recommender import FEATURES, scoring_version
+
+
+def save_neighbor_assessment(value, version):
+    data = {'name': 'Blended', 'school': 'New School', 'strand': 'STEM', 'tvl_strand': 'Not applicable'}
+    data.update({feature: value for feature in FEATURES})
+    index = neighbors.get_neighbor_index()
+    recommendations = neighbors.get_neighbor_recommendations(data, index=index)
+    return database.save_assessment_results(data, recommendations, version)
+
+def test_neighbor_mode_rows_are_rescored_in_neighbor_mode(baseline_database):
+    database.set_database_path(baseline_database)
+    database.init_database()
+    blended_version = neighbors.NEIGHBOR_VERSION_PREFIX + scoring_version()
+    current = save_neighbor_assessment(4, blended_version)
+    stale = save_neighbor_assessment(2, neighbors.NEIGHBOR_VERSION_PREFIX + 'old')
+    
+    # The two baseline assessments and the stale blended one
+    assert rescoring.rescore(workers=1)['rescored'] == 3
+    with database.get_connection() as conn:
+        versions = dict(conn.execute("SELECT DISTINCT assessment_id, recommendation_version FROM recommendations"))
+        replaced = {assessment_id for assessment_id, in conn.execute(
+            "SELECT DISTINCT assessment_id FROM recommendation_history"
+        )}
+    assert versions == {1: scoring_version(), 2: scoring_version(), current: blended_version, stale: blended_version}
+    assert replaced == {1, 2, stale}
@@ -0,0 +1,93 @@
+import bootstrap
+import database
+import neighbors
+from recommender import FEATURES, get_batch_recommendations, get_recommendations, scoring_version
+
+
+def assessment(**answers):
+    return {
+        'name': 'Test', 'school': 'Test School', 'strand': 'STEM', 'tvl_strand': 'Not applicable',
+        **{feature: 3 for feature in FEATURES}, **answers
+    }
+
+def test_bootstrap_with_dbapi_storage(dbapi_storage, tmp_path, monkeypatch):
+    monkeypatch.setattr(bootstrap, '_state', None)
+    state = bootstrap.bootstrap()
+    assert state['precomputed_profiles'] == 0
+    assert not (tmp_path / database.DATABASE_PATH).exists()
+    
+    data = assessment(technology_interest=5)
+    recommendations, version = get_recommendations(data, with_version=True)
+    assessment_id = database.save_assessment_results(data, recommendations, version)
+    database.save_feedback(assessment_id, recommendations[0]['course'], 5)
+    
+    index = neighbors.build_neighbor_index()
+    assert len(index) == 1
+    assert neighbors.get_neighbor_recommendations(data, index=index)[0]['course'] == recommendations[0]['course']
+    assert database.get_dashboard_stats()['total_assessments'] == 1
+    assert not (tmp_path / database.DATABASE_PATH).exists()
+
+def test_profile_rankings_load_from_sqlite(sqlite_database):
+    for _ in range(3):
+        data = assessment(arts_interest=5)
+        database.save_assessment_results(data, *get_recommendations(data, with_version=True))
+    database.precompute_profile_recommendations(limit=10)
+    assert database.load_profile_recommendations() == 1
+
+def test_neighbor_recommendations_keep_their_own_version(sqlite_database):
+    data = assessment(technology_interest=5)
+    database.save_assessment_results(data, *get_recommendations(data, with_version=True))
+    index = neighbors.build_neighbor_index()
+    version = neighbors.neighbor_scoring_version(index)
+    database.save_assessment_results(data, neighbors.get_neighbor_recommendations(data, index=index), version)
+    
+    with database.get_connection() as conn:
+        versions = conn.execute('''
+            SELECT recommendation_version, COUNT(*) FROM recommendations GROUP BY recommendation_version
+        ''').fetchall()
+    assert sorted(versions) == sorted([(scoring_version(), 3), ('neighbors-' + scoring_version(), 3)])
+
+def test_saved_rows_keep_the_version_they_were_scored_with(sqlite_database, monkeypatch):
+    data = assessment(arts_interest=5)
+    recommendations, version = get_recommendations(data, with_version=True)
+    results = get_batch_recommendations([[data[feature] for feature in FEATURES]])
+    
+    # A catalog reload after scoring must not retag the rows, and the write
+    # transactions never load the catalog
+    def reloaded_catalog():
+        raise AssertionError("the catalog was read while saving")
+    
+    monkeypatch.setattr(database, 'get_catalog', reloaded_catalog)
+    monkeypatch.setattr(database, 'scoring_version', reloaded_catalog)
+    database.save_assessment_results(data, recommendations, version)
+    database.save_batch_results([data], results, results['version'])
+    
+    with database.get_connection() as conn:
+        versions = conn.execute("SELECT DISTINCT recommendation_version FROM recommendations").fetchall()
+    assert versions == [(version,)]
+
+def test_dbapi_trends_are_cached_until_a_write(dbapi_storage, monkeypatch):
+    database.init_database()
+    data = assessment()
+    database.save_assessment_results(data, *get_recommendations(data, with_version=True))
+    queries = []
+    count_daily_trends = dbapi_storage.count_daily_trends
+    
+    def counted(*args):
+        queries.append(args)
+        return count_daily_trends(*args)
+    
+    monkeypatch.setattr(dbapi_storage, 'count_daily_trends', counted)
+    
+    # Every period is bucketed from the same daily counts
+    assert [database.load_trends(period)['assessments'] for period in database.TREND_PERIODS] == [[1]] * 3
+    assert database.load_trends('week', strand='STEM')['assessments'] == [1]
+    assert database.load_trends('week', strand='ABM')['assessments'] == []
+    assert len(queries) == 3
+    assert database.load_trend_slices() == database.load_trend_slices() == {
+        'strands': ['STEM'], 'schools': ['Test School']
+    }
+    
+    database.save_assessment_results(data, *get_recommendations(data, with_version=True))
+    assert database.load_trends('day')['assessments'] == [2]
+    assert len(queries) == 4
@@ -0,0 +1,79 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import database
+import recommender
+import training
+from recommender import FEATURES, get_recommendations, scoring_version
+
+
+def rate_synthetic_assessments(n, seed=0):
+    # Students rate Nursing by their teamwork answer and Computer Science
+    # by their technology interest; no other course gets ratings
+    rng = np.random.default_rng(seed)
+    ratings = []
+    for answers in rng.integers(1, 6, size=(n, len(FEATURES))).tolist():
+        data = {'name': 'Synthetic', 'school': 'Test School', 'strand': 'STEM', 'tvl_strand': 'Not applicable'}
+        data.update(zip(FEATURES, answers))
+        assessment_id = database.save_assessment_results(data, *get_recommendations(data, with_version=True))
+        ratings.append((assessment_id, 'Nursing', data['teamwork_ability']))
+        ratings.append((assessment_id, 'Computer Science', data['technology_interest']))
+    database.save_feedback_batch(ratings)
+    return len(ratings)
+
+def test_trained_weights_replace_the_rules(sqlite_database, use_catalog):
+    rules = use_catalog()
+    ratings = rate_synthetic_assessments(300)
+    artifact = training.train(ridge=1.0)
+    assert artifact['ratings'] == ratings
+    assert artifact['rmse']['learned'] < artifact['rmse']['rules']
+    
+    nursing = artifact['courses']['Nursing']['weights']
+    assert max(nursing, key=nursing.get) == 'teamwork_ability'
+    assert nursing['teamwork_ability'] == pytest.approx(1.0, abs=0.05)
+    # Unrated courses keep their rule weights
+    psychology = artifact['courses']['Psychology']
+    assert psychology['ratings'] == 0 and psychology['bias'] == pytest.approx(0.0, abs=1e-9)
+    row = rules.index['Psychology']
+    assert [psychology['weights'][feature] for feature in FEATURES] == pytest.approx(training.rule_weights(rules)[row])
+    
+    versioned_path = training.write_artifact(artifact, recommender.WEIGHTS_PATH)
+    assert os.path.exists(versioned_path)
+    learned = recommender.reload_catalog()
+    assert learned.weights_version == artifact['version']
+    assert scoring_version() == learned.version != rules.version
+    assert learned.bias[learned.index['Nursing']] == artifact['courses']['Nursing']['bias']
+
+def test_missing_or_corrupt_artifact_falls_back_to_the_rules(sqlite_database, use_catalog, monkeypatch):
+    rules = use_catalog()
+    assert rules.weights_version == 'rules'
+    artifact = training.train()
+    
+    valid = json.dumps(artifact)
+    no_bias = json.loads(valid)
+    del no_bias['courses']['Nursing']['bias']
+    no_version = {key: value for key, value in artifact.items() if key != 'version'}
+    contents = [
+        valid[:len(valid) // 2], '[]',
+        json.dumps(dict(artifact, features=FEATURES[:-1])),
+        json.dumps(no_bias),
+        json.dumps(no_version)
+    ]
+    for content in contents:
+        # From a learned catalog, as when a bad artifact replaces a good one
+        training.write_artifact(artifact, recommender.WEIGHTS_PATH)
+        assert recommender.reload_catalog().version != rules.version
+        with open(recommender.WEIGHTS_PATH, 'w') as artifact_file:
+            artifact_file.write(content)
+        catalog = recommender.reload_catalog()
+        assert (catalog.weights_version, catalog.version) == ('rules', rules.version)
+    
+    # The first load does not fail either
+    monkeypatch.setattr(recommender, '_catalog', None)
+    assert recommender.get_catalog().version == rules.version
+    
+    os.remove(recommender.WEIGHTS_PATH)
+    assert recommender.reload_catalog().version == rules.version
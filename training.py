@@ -0,0 +1,112 @@
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from database import iter_rating_statistics
+from recommender import (
+    FEATURES, WEIGHTS_PATH,
+    build_weight_matrix, course_indices, get_catalog, unpack_answer_matrix
+)
+
+
+DEFAULT_RIDGE = 10.0
+CHUNK_SIZE = 200000
+
+def rule_weights(catalog=None):
+    # Hand-set catalog weights as a dense (courses x features) matrix
+    _, weights = build_weight_matrix((catalog or get_catalog()).course_weights)
+    return weights.sum(axis=0)
+
+def accumulate_statistics(chunks, catalog=None):
+    # Per-course normal equations for rating ~ bias + weights . answers:
+    # gram[c] = sum(n * x x^T), moment[c] = sum(rating_sum * x), with x = [1, answers]
+    catalog = catalog or get_catalog()
+    n_courses, n_terms = len(catalog.names), len(FEATURES) + 1
+    gram = np.zeros((n_courses, n_terms, n_terms))
+    moment = np.zeros((n_courses, n_terms))
+    rating_sq = np.zeros(n_courses)
+    counts = np.zeros(n_courses, dtype=np.int64)
+    
+    for chunk in chunks:
+        # Ratings for courses no longer in the catalog are skipped
+        courses = course_indices(chunk['course'], catalog)
+        x = np.hstack([np.ones((len(chunk), 1)), unpack_answer_matrix(chunk['code']).astype(np.float64)])
+        
+        for course in np.unique(courses[courses >= 0]):
+            mask = courses == course
+            xc = x[mask]
+            gram[course] += xc.T @ (xc * chunk['n'][mask, None])
+            moment[course] += xc.T @ chunk['sum'][mask]
+            rating_sq[course] += chunk['sq'][mask].sum()
+            counts[course] += int(chunk['n'][mask].sum())
+    
+    return gram, moment, rating_sq, counts
+
+def fit_weights(gram, moment, ridge=DEFAULT_RIDGE, prior=None):
+    # Ridge regression pulled toward the hand-set weights, so courses with
+    # little feedback stay close to the rules (and unrated ones keep them)
+    n_courses, n_terms = moment.shape
+    prior = rule_weights() if prior is None else prior
+    prior_terms = np.hstack([np.zeros((n_courses, 1)), prior])
+    penalty = ridge * np.diag([0.0] + [1.0] * (n_terms - 1))
+    # Unrated courses get a unit bias penalty too so the system stays solvable
+    penalty = np.broadcast_to(penalty, gram.shape).copy()
+    penalty[gram[:, 0, 0] == 0, 0, 0] = 1.0
+    
+    target = moment + np.einsum('cij,cj->ci', penalty, prior_terms)
+    solution = np.linalg.solve(gram + penalty, target[..., None])[..., 0]
+    return solution[:, 1:], solution[:, 0]
+
+def squared_error(gram, moment, rating_sq, weights, bias):
+    terms = np.hstack([bias[:, None], weights])
+    return (np.einsum('ci,cij,cj->c', terms, gram, terms) - 2 * (terms * moment).sum(axis=1) + rating_sq)
+
+def train(ridge=DEFAULT_RIDGE, chunk_size=CHUNK_SIZE):
+    catalog = get_catalog()
+    gram, moment, rating_sq, counts = accumulate_statistics(iter_rating_statistics(chunk_size), catalog)
+    
+    prior = rule_weights(catalog)
+    weights, bias = fit_weights(gram, moment, ridge, prior)
+    
+    total = max(int(counts.sum()), 1)
+    learned_error = squared_error(gram, moment, rating_sq, weights, bias).sum()
+    rule_error = squared_error(gram, moment, rating_sq, prior, np.zeros(len(catalog.names))).sum()
+    
+    version = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+    return {
+        'version': version,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'features': FEATURES,
+        'ridge': ridge,
+        'ratings': int(counts.sum()),
+        'rmse': {
+            'rules': float(np.sqrt(max(rule_error, 0) / total)),
+            'learned': float(np.sqrt(max(learned_error, 0) / total))
+        },
+        'courses': {
+            course: {
+                'ratings': int(counts[index]),
+                'bias': float(bias[index]),
+                'weights': dict(zip(FEATURES, weights[index].tolist()))
+            }
+            for index, course in enumerate(catalog.names)
+        }
+    }
+
+def write_artifact(artifact, path=WEIGHTS_PATH):
+    # Keeps every version next to the active file, which is swapped in
+    # atomically so a running app never reads a half-written artifact
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    stem, extension = os.path.splitext(os.path.basename(path))
+    versioned_path = os.path.join(directory, f"{stem}-{artifact['version']}{extension}")
+    with open(versioned_path, 'w') as artifact_file:
+        json.dump(artifact, artifact_file, indent=2)
+    
+    staging_path = path + '.tmp'
+    with open(staging_path, 'w') as artifact_file:
+        json.dump(artifact, artifact_file, indent=2)
+    os.replace(staging_path, path)
+    return versioned_path
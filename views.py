@@ -0,0 +1,78 @@
+import functools
+
+import streamlit as st
+
+from feedback_writer import get_feedback_writer
+from recommender import DEFAULT_IMAGE, get_catalog
+
+
+# Page sections shared by the Dashboard and Results pages. Streamlit reruns
+# the whole script on every click, so the markup of a course card is
+# built once per course and reused, and each section emits as few
+# elements as it can.
+RATING_OPTIONS = ["😞 1", "🙁 2", "😐 3", "🙂 4", "😊 5"]
+# Shown for a course the catalog dropped after it was recommended
+REMOVED_COURSE = {'description': "This course is no longer offered.", 'image': DEFAULT_IMAGE}
+
+@functools.lru_cache(maxsize=None)
+def course_image(image, size):
+    return f"<div style='font-size: {size}px; text-align: center;'>{image}</div>"
+
+@functools.lru_cache(maxsize=None)
+def course_text(course_name, description):
+    return f"### {course_name}\n{description}"
+
+def confidence_percent(score):
+    # Scale to percentage
+    return min(95, max(60, score * 20))
+
+def render_course(course_name, image_size):
+    # Image column and a text column for the caller to add to
+    course = get_catalog().courses.get(course_name, REMOVED_COURSE)
+    image_column, text_column = st.columns([1, 4])
+    image_column.markdown(course_image(course['image'], image_size), unsafe_allow_html=True)
+    text_column.markdown(course_text(course_name, course['description']))
+    return text_column
+
+def render_dashboard_stats(stats):
+    col1, col2, col3 = st.columns(3)
+    col1.metric(label="📚 Total Courses Available", value=stats['total_courses'])
+    col2.metric(label="✅ Assessments Completed", value=stats['total_assessments'])
+    col3.metric(label="👍 Agreement Rate", value=f"{stats['agreement_rate']:.1f}%")
+
+def render_popular_courses(popular_courses):
+    courses = get_catalog().courses
+    shown = [course for course in popular_courses if course['course_name'] in courses]
+    if not popular_courses:
+        st.info("No recommendations yet. Complete an assessment to see popular courses!")
+    for i, course_data in enumerate(shown):
+        text_column = render_course(course_data['course_name'], 60)
+        text_column.caption(f"Recommended {course_data['count']} times")
+        if i < len(shown) - 1:
+            st.divider()
+
+def rating_key(assessment_id, course_name):
+    return f"rating_{course_name}_{assessment_id}"
+
+def submit_rating(assessment_id, course_name):
+    # on_change callback: runs before the rerun, so the page that follows
+    # already shows the rating
+    choice = st.session_state[rating_key(assessment_id, course_name)]
+    if choice is not None:
+        get_feedback_writer().submit(assessment_id, course_name, RATING_OPTIONS.index(choice) + 1)
+
+def render_recommendation(recommendation, assessment_id):
+    course_name = recommendation['course']
+    text_column = render_course(course_name, 80)
+    text_column.info(f"**Why this course?** {recommendation['explanation']}")
+    confidence = confidence_percent(recommendation['score'])
+    text_column.progress(confidence / 100, text=f"Match confidence: {confidence:.0f}%")
+    
+    # One widget per card; a rating only writes to the feedback queue
+    key = rating_key(assessment_id, course_name)
+    st.radio(
+        "**Did you like this recommendation?**", RATING_OPTIONS, index=None, key=key, horizontal=True,
+        on_change=submit_rating, args=(assessment_id, course_name)
+    )
+    if st.session_state.get(key) is not None:
+        st.success(f"Thank you for rating {course_name}!")